@@ -0,0 +1,58 @@
+"""
+Stand-in for the upstream token feed, for benchmarks. The trading and
+classifier API stub is trading/stub_api.py.
+
+StubUpstream is the upstream websocket: it sends ``kind`` frames ('tokens'
+signals or timestamped 'benchmark' frames) to every connected ingest client
+while ``sending`` is set, a share ``invalid_rate`` of them malformed.
+"""
+
+import asyncio
+import json
+import random
+import time
+
+
+class StubUpstream:
+    """
+    Stand-in for the upstream token feed: sends numbered, timestamped frames
+    to every connected ingest client while ``sending`` is set. Serve it with
+    websockets.asyncio.server.serve(upstream.handler, ...).
+    """
+    def __init__(self, kind: str = 'benchmark', invalid_rate: float = 0.0, seed: int = 0):
+        self.kind = kind
+        self.invalid_rate = invalid_rate
+        self.clients = set()
+        self.sending = asyncio.Event()
+        self.sequence = 0
+        self.invalid = 0
+        self._random = random.Random(seed)
+
+    async def handler(self, ws):
+        self.clients.add(ws)
+        try:
+            await ws.wait_closed()
+        finally:
+            self.clients.discard(ws)
+
+    def frame(self) -> str:
+        self.sequence += 1
+        if self.invalid_rate > 0 and self._random.random() < self.invalid_rate:
+            self.invalid += 1
+            return '{"type": "tokens", "data": '
+        if self.kind == 'tokens':
+            return json.dumps({'type': 'tokens', 'seq': self.sequence, 'ts': time.time(), 'data': [
+                {'token': f'BENCH{self.sequence}', 'exchange': 'Binance', 'market': 'spot'},
+            ]})
+        return json.dumps({'type': 'benchmark', 'seq': self.sequence, 'ts': time.time()})
+
+    async def pump(self, rate: float):
+        while True:
+            await self.sending.wait()
+            frame = self.frame()
+            for ws in list(self.clients):
+                try:
+                    await ws.send(frame)
+                except Exception:
+                    pass
+            await asyncio.sleep(1 / rate)
@@ -0,0 +1,385 @@
+"""
+Throughput and latency of the main request paths against local stubs.
+
+Runs everything in this one process with stand-ins for the trading and
+classifier APIs (trading/stub_api.py) and the upstream token feed
+(stubs.py), a throwaway SQLite database and the in-memory channel layer; no
+Redis or real service is used.
+
+Scenarios:
+- dashboard: GET / (DashboardView, three classifier calls per page)
+- rules: the rule API (AutomationRuleView), three list reads per create
+- fanout: upstream frames through the ingest reader to --connections
+  TradingConsumer sockets, latency from the upstream send to the socket
+- automation: upstream token signals matched against one rule, one order
+  each, latency from parsing to the trade notification (latency.py)
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --latency-ms 50 --error-rate 0.05 --json run.json
+    python -m benchmarks.suite --baseline run.json    # exit status 1 on regression
+
+"errors" counts failed requests, dashboard pages with a missing section,
+undelivered fan-out frames and token signals without an acknowledged order.
+With --baseline, a scenario regresses when its throughput drops or its p95
+rises by more than --tolerance, or its share of errors grows.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from websockets.asyncio.server import serve
+
+from trading.stub_api import StubApiServer
+
+from .stubs import StubUpstream
+
+SCENARIOS = ('dashboard', 'rules', 'fanout', 'automation')
+
+
+def _summary(latencies: List[float], operations: int, errors: int, elapsed: float, **extra) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+
+    def percentile(share: float) -> Optional[float]:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(share * len(ordered)))], 2)
+
+    return {
+        'operations': operations,
+        'errors': errors,
+        'ops_per_s': round(operations / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(statistics.median(ordered), 2) if ordered else None,
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        **extra,
+    }
+
+
+def _setup_django(api: StubApiServer, directory: str) -> str:
+    """
+    Point the API clients at the stub and create a throwaway database in
+    ``directory``. Returns the original database name for teardown.
+    """
+    os.environ.update(
+        TRADE_API_URL=api.url,
+        CLASSIFIER_API_URL=api.url,
+        ENVIRONMENT='benchmark',
+        INGEST_LEADER_BACKEND='none',
+        DJANGO_ALLOWED_HOSTS='*',
+    )
+    # In-memory channel layer and cache, whatever the shell has configured
+    os.environ.pop('REDIS_URL', None)
+    os.environ.pop('REDIS_CACHE_URL', None)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'the_combiner_view.settings')
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'benchmark')
+
+    import django
+    django.setup()
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    # A file rather than :memory: so worker threads share it
+    connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'db.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return old_name
+
+
+def _run_requests(request: Callable[[Any, int], bool], count: int, concurrency: int,
+                  make_client: Callable[[], Any]) -> Dict[str, Any]:
+    """
+    Call ``request(client, index)`` ``count`` times from ``concurrency``
+    threads, each with its own client. ``request`` returns False on error.
+    """
+    local = threading.local()
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def run(index: int) -> None:
+        nonlocal errors
+        if not hasattr(local, 'client'):
+            local.client = make_client()
+        started = time.perf_counter()
+        try:
+            ok = request(local.client, index)
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(run, range(count)))
+    return _summary(latencies, count, errors, time.perf_counter() - started)
+
+
+def bench_dashboard(args) -> Dict[str, Any]:
+    from django.test import Client
+
+    def request(client, index):
+        response = client.get('/')
+        sections = response.get('Server-Timing', '')
+        return response.status_code == 200 and sections.count('desc="ok"') == 3
+
+    return _run_requests(request, args.requests, args.concurrency, Client)
+
+
+def bench_rules(args) -> Dict[str, Any]:
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    user, _ = User.objects.get_or_create(username='benchmark')
+
+    def make_client():
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def request(client, index):
+        if index % 4 == 3:
+            # Disabled, so the automation scenario keeps matching one rule
+            rule = {'exchanges': ['Binance'], 'market_type': 'spot', 'account': '1',
+                    'amount_usdt': 10, 'status': 'disabled'}
+            response = client.post('/trading/rules/', json.dumps(rule), content_type='application/json')
+        else:
+            response = client.get('/trading/rules/')
+        return response.status_code == 200 and response.json()['success']
+
+    return _run_requests(request, args.requests, args.concurrency, make_client)
+
+
+async def _send_for(upstream: StubUpstream, kind: str, duration: float) -> int:
+    """
+    Let the upstream send ``kind`` frames for ``duration``; returns how many
+    well-formed frames went out.
+    """
+    upstream.kind = kind
+    sequence, invalid = upstream.sequence, upstream.invalid
+    upstream.sending.set()
+    await asyncio.sleep(duration)
+    upstream.sending.clear()
+    return (upstream.sequence - sequence) - (upstream.invalid - invalid)
+
+
+async def bench_fanout(args, upstream: StubUpstream) -> Dict[str, Any]:
+    from channels.testing import WebsocketCommunicator
+    from trading.consumers import TradingConsumer
+
+    application = TradingConsumer.as_asgi()
+    latencies: List[float] = []
+    received = 0
+    recording = False
+
+    async def read(socket):
+        nonlocal received
+        while True:
+            text = await socket.receive_from(timeout=3600)
+            if not recording:
+                continue
+            try:
+                messages = json.loads(text)
+            except ValueError:
+                # Malformed upstream frames are relayed as received
+                continue
+            now = time.time()
+            # Bursts arrive coalesced into one array frame
+            for message in messages if isinstance(messages, list) else [messages]:
+                if message.get('type') == 'benchmark':
+                    received += 1
+                    latencies.append((now - message['ts']) * 1000)
+
+    sockets = []
+    for _ in range(args.connections):
+        socket = WebsocketCommunicator(application, '/ws/trading/')
+        connected, _ = await socket.connect(timeout=10)
+        if not connected:
+            raise RuntimeError('Dashboard socket was refused')
+        sockets.append(socket)
+    readers = [asyncio.create_task(read(socket)) for socket in sockets]
+    await asyncio.sleep(0.5)
+
+    recording = True
+    sent = await _send_for(upstream, 'benchmark', args.duration)
+    await asyncio.sleep(1)  # let in-flight frames arrive
+    recording = False
+
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    for socket in sockets:
+        try:
+            await socket.disconnect()
+        except Exception:
+            pass
+    expected = sent * len(sockets)
+    return _summary(latencies, received, expected - received, args.duration,
+                    connections=len(sockets), frames_sent=sent)
+
+
+async def bench_automation(args, upstream: StubUpstream, api: StubApiServer, service) -> Dict[str, Any]:
+    from asgiref.sync import sync_to_async
+    from trading import latency
+    from trading.models import AutomationRule
+
+    await sync_to_async(AutomationRule.objects.create)(
+        exchanges=['Binance'], market_type='spot', account='1', amount_usdt=10,
+    )
+    queue = service.automation_queue
+    enqueued, orders = queue.enqueued, api.orders
+
+    started = time.perf_counter()
+    await _send_for(upstream, 'tokens', args.duration)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        stats = queue.stats()
+        if stats['processed'] + stats['dropped'] >= stats['enqueued'] and not stats['busy_workers']:
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    signals = queue.enqueued - enqueued
+    acknowledged = api.orders - orders
+    stages = {
+        stage: {key: value for key, value in snapshot.items() if key != 'buckets'}
+        for stage, snapshot in latency.stats().items()
+    }
+    notified = stages.get(latency.BROADCAST_SENT, {})
+    return {
+        'operations': signals,
+        'errors': max(0, signals - acknowledged),
+        'ops_per_s': round(signals / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': notified.get('p50_ms'),
+        'p95_ms': notified.get('p95_ms'),
+        'p99_ms': notified.get('p99_ms'),
+        'orders_acknowledged': acknowledged,
+        'queue_dropped': queue.dropped,
+        'stages': stages,
+    }
+
+
+async def _bench_upstream(args, api: StubApiServer, selected: List[str]) -> Dict[str, Dict[str, Any]]:
+    from trading.external_service import ExternalWebSocketService
+
+    results = {}
+    upstream = StubUpstream(invalid_rate=args.invalid_rate)
+    async with serve(upstream.handler, '127.0.0.1', 0) as server:
+        os.environ['EXTERNAL_WS_URL'] = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        pump = asyncio.create_task(upstream.pump(args.rate))
+        service = ExternalWebSocketService.get_instance()
+        service.use_loop(asyncio.get_running_loop())
+        service.start()
+        try:
+            while not (service.is_connected and upstream.clients):
+                await asyncio.sleep(0.05)
+            if 'fanout' in selected:
+                results['fanout'] = await bench_fanout(args, upstream)
+            if 'automation' in selected:
+                results['automation'] = await bench_automation(args, upstream, api, service)
+        finally:
+            service.stop()
+            pump.cancel()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions of ``results`` against an earlier --json report.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        if before['ops_per_s'] and result['ops_per_s'] < before['ops_per_s'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['ops_per_s']} -> {result['ops_per_s']} ops/s")
+        if before['p95_ms'] and result['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        share_before = before['errors'] / before['operations'] if before['operations'] else 0
+        share = result['errors'] / result['operations'] if result['operations'] else 0
+        if share > share_before + 0.01:
+            regressions.append(f"{name}: errors {share_before:.1%} -> {share:.1%}")
+    return regressions
+
+
+def _print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'scenario':<11} {'ops':>7} {'errors':>7} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, result in results.items():
+        cells = ''.join(f" {'-' if result[key] is None else result[key]:>8}" for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{name:<11} {result['operations']:>7} {result['errors']:>7} {result['ops_per_s']:>9}{cells}")
+
+
+def main(args) -> int:
+    if not args.verbose:
+        # Per-request and per-signal INFO records would drown the report
+        logging.disable(logging.CRITICAL)
+    selected = [name for name in SCENARIOS if name in args.scenarios]
+
+    api = StubApiServer(latency=args.latency_ms / 1000, error_rate=args.error_rate).start()
+    directory = tempfile.mkdtemp(prefix='combiner-bench-')
+    old_name = _setup_django(api, directory)
+    from django.db import connection
+
+    results = {}
+    try:
+        if 'dashboard' in selected:
+            results['dashboard'] = bench_dashboard(args)
+        if 'rules' in selected:
+            results['rules'] = bench_rules(args)
+        if 'fanout' in selected or 'automation' in selected:
+            results.update(asyncio.run(_bench_upstream(args, api, selected)))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(directory, ignore_errors=True)
+        api.stop()
+
+    _print_report(results)
+    report = {'config': {key: value for key, value in vars(args).items() if key not in ('json_path', 'baseline')},
+              'results': results}
+    if args.json_path:
+        with open(args.json_path, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as previous:
+            regressions = compare(results, json.load(previous), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', type=lambda value: value.split(','), default=list(SCENARIOS),
+                        help=f"Comma separated, from {','.join(SCENARIOS)}")
+    parser.add_argument('--latency-ms', type=float, default=20, help='Response time of the stub APIs')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of stub API requests failing with 503')
+    parser.add_argument('--invalid-rate', type=float, default=0.0, help='Share of malformed upstream frames')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per HTTP scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP clients')
+    parser.add_argument('--connections', type=int, default=100, help='Dashboard sockets for fanout')
+    parser.add_argument('--rate', type=float, default=20, help='Upstream frames per second')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds of upstream traffic per scenario')
+    parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+    parser.add_argument('--baseline', help='Earlier --json report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown')
+    parser.add_argument('--verbose', action='store_true', help='Keep the application log output')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main(parse_args()))
@@ -0,0 +1,205 @@
+"""
+Dashboard websocket load test: connection count versus server memory and CPU.
+
+Starts a Daphne worker fed by a stub upstream token feed, then opens
+dashboard connections to ws/trading/ in steps. At every step the stub sends
+--rate frames per second for --duration seconds and the report shows the
+worker's resident memory, CPU use, frames delivered and delivery latency.
+
+    python -m benchmarks.ws_connections --steps 250,500,1000,2000 --rate 10
+
+With --msgpack the dashboards negotiate the binary msgpack subprotocol;
+"wire KB" is what one dashboard received during the step.
+
+Linux only (reads /proc). All dashboards run in this one process, so at
+high connection counts part of the reported latency is client-side
+queueing. The open-file limit is raised to the hard limit automatically.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import msgpack
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import serve
+
+from .stubs import StubUpstream
+
+ROOT = Path(__file__).resolve().parent.parent
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+class Dashboard:
+    """
+    One dashboard client counting benchmark frames and their latency.
+    """
+    def __init__(self, latencies: List[float], binary: bool = False):
+        self.latencies = latencies
+        self.binary = binary
+        self.received = 0
+        self.wire_bytes = 0
+        self.recording = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def run(self, url: str, connected: asyncio.Future):
+        try:
+            subprotocols = ['msgpack'] if self.binary else None
+            async with connect(url, open_timeout=30, ping_interval=None, max_queue=None,
+                               subprotocols=subprotocols) as ws:
+                connected.set_result(True)
+                async for frame in ws:
+                    if not self.recording:
+                        continue
+                    now = time.time()
+                    self.wire_bytes += len(frame)
+                    messages = msgpack.unpackb(frame) if self.binary else json.loads(frame)
+                    # Bursts arrive coalesced into one array frame
+                    for message in messages if isinstance(messages, list) else [messages]:
+                        if message.get('type') == 'benchmark':
+                            self.received += 1
+                            self.latencies.append((now - message['ts']) * 1000)
+        except Exception as e:
+            if not connected.done():
+                connected.set_exception(e)
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f'/proc/{pid}/stat') as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    # utime and stime, fields 14 and 15 counted from the pid
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _threads(pid: int) -> int:
+    return len(os.listdir(f'/proc/{pid}/task'))
+
+
+def _raise_open_files_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def _wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def main(args) -> None:
+    _raise_open_files_limit()
+    stub = StubUpstream()
+    async with serve(stub.handler, '127.0.0.1', 0) as upstream:
+        upstream_port = upstream.sockets[0].getsockname()[1]
+        pump = asyncio.create_task(stub.pump(args.rate))
+
+        env = dict(
+            os.environ,
+            EXTERNAL_WS_URL=f'ws://127.0.0.1:{upstream_port}',
+            ENVIRONMENT='benchmark',
+            INGEST_LEADER_BACKEND='none',
+            DJANGO_ALLOWED_HOSTS='*',
+        )
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'the_combiner_view.settings')
+        env.setdefault('DJANGO_SECRET_KEY', 'benchmark')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'daphne', '-p', str(args.port), 'the_combiner_view.asgi:application'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+            stderr=open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL,
+        )
+        dashboards: List[Dashboard] = []
+        try:
+            await _wait_for_port(args.port)
+            while not stub.clients:
+                await asyncio.sleep(0.1)
+            url = f'ws://127.0.0.1:{args.port}/ws/trading/'
+
+            print(f"{'connections':>11} {'rss MB':>8} {'KB/conn':>8} {'cpu %':>6} {'threads':>7} "
+                  f"{'delivered':>10} {'p50 ms':>7} {'p99 ms':>7} {'wire KB':>8}")
+            baseline_rss = _rss_mb(server.pid)
+            for target in args.steps:
+                latencies: List[float] = []
+                while len(dashboards) < target:
+                    batch = []
+                    for _ in range(min(args.batch, target - len(dashboards))):
+                        dashboard = Dashboard(latencies, args.msgpack)
+                        connected = asyncio.get_running_loop().create_future()
+                        dashboard.task = asyncio.create_task(dashboard.run(url, connected))
+                        dashboards.append(dashboard)
+                        batch.append(connected)
+                    await asyncio.gather(*batch)
+                for dashboard in dashboards:
+                    dashboard.latencies = latencies
+                    dashboard.received = 0
+                    dashboard.wire_bytes = 0
+                    dashboard.recording = True
+
+                await asyncio.sleep(1)
+                cpu_before, started = _cpu_seconds(server.pid), time.monotonic()
+                first = stub.sequence + 1
+                stub.sending.set()
+                await asyncio.sleep(args.duration)
+                stub.sending.clear()
+                sent = stub.sequence - first + 1
+                await asyncio.sleep(1)  # let in-flight frames arrive
+                cpu = (_cpu_seconds(server.pid) - cpu_before) / (time.monotonic() - started) * 100
+
+                for dashboard in dashboards:
+                    dashboard.recording = False
+                rss = _rss_mb(server.pid)
+                received = sum(dashboard.received for dashboard in dashboards)
+                wire_kb = sum(dashboard.wire_bytes for dashboard in dashboards) / len(dashboards) / 1024
+                expected = sent * len(dashboards)
+                p50 = statistics.median(latencies) if latencies else float('nan')
+                p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) >= 100 else float('nan')
+                per_connection = (rss - baseline_rss) * 1024 / len(dashboards)
+                print(f"{len(dashboards):>11} {rss:>8.1f} {per_connection:>8.1f} {cpu:>6.1f} {_threads(server.pid):>7} "
+                      f"{received / expected:>9.1%} {p50:>7.1f} {p99:>7.1f} {wire_kb:>8.1f}", flush=True)
+        finally:
+            pump.cancel()
+            for dashboard in dashboards:
+                dashboard.task.cancel()
+            server.terminate()
+            server.wait()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=lambda value: [int(step) for step in value.split(',')],
+                        default=[100, 500, 1000, 2000], help='Connection counts, comma separated')
+    parser.add_argument('--rate', type=float, default=10, help='Upstream frames per second')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds of traffic per step')
+    parser.add_argument('--batch', type=int, default=25,
+                        help='Connections opened concurrently, Daphne listens with a backlog of 50')
+    parser.add_argument('--port', type=int, default=7990)
+    parser.add_argument('--server-log', help="File for the worker's log output")
+    parser.add_argument('--msgpack', action='store_true', help='Negotiate the binary msgpack subprotocol')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
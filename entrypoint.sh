@@ -41,5 +41,9 @@ except Exception as e:
 END
 fi
 
-# Start Daphne
+# Start Daphne. DAPHNE_WORKERS > 1 runs several workers on the same port
+# and needs REDIS_URL for the shared channel layer
+if [ "${DAPHNE_WORKERS:-1}" -gt 1 ]; then
+    exec python -m the_combiner_view.workers --workers "$DAPHNE_WORKERS" --bind 0.0.0.0 --port 7999
+fi
 exec daphne -b 0.0.0.0 -p 7999 the_combiner_view.asgi:application 
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Response cache for rarely changing upstream reads.
+
+Channels and exchanges configured in the classifier API change only when
+someone edits them from the dashboard, yet they are read on every dashboard
+render and partial refresh. Read methods decorated with ``cached_read`` keep
+their result in Django's cache framework (shared across Daphne workers when
+a shared backend is configured) for a per-endpoint TTL, and the matching
+write methods drop the entry as soon as the upstream accepts a change.
+
+TTLs come from settings.UPSTREAM_CACHE_TTLS, e.g. {'channels': 300}.
+
+A second, long-lived copy of every cached value is kept for
+settings.UPSTREAM_STALE_TTL seconds. When the upstream cannot be reached
+(including an open circuit breaker) the read returns that last known value
+instead of failing.
+"""
+
+import asyncio
+import functools
+from typing import Any, Callable
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+# Upstream unreachable: serve the last known value if there is one
+UNAVAILABLE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError)
+
+
+def _cache_key(name: str) -> str:
+    return f"upstream:{name}"
+
+
+def _stale_key(name: str) -> str:
+    return f"upstream:stale:{name}"
+
+
+def _ttl(name: str) -> int:
+    return settings.UPSTREAM_CACHE_TTLS.get(name, 0)
+
+
+def _cacheable(value: Any) -> bool:
+    # The config endpoints return lists; anything else is an error payload
+    return isinstance(value, list)
+
+
+def cached_read(name: str) -> Callable:
+    """
+    Cache the result of a sync or async read method under ``name``.
+    """
+    def decorator(method: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(*args, **kwargs):
+                ttl = _ttl(name)
+                if ttl > 0:
+                    value = await cache.aget(_cache_key(name))
+                    if value is not None:
+                        return value
+                try:
+                    value = await method(*args, **kwargs)
+                except UNAVAILABLE_ERRORS:
+                    stale = await cache.aget(_stale_key(name))
+                    if stale is None:
+                        raise
+                    return stale
+                if ttl > 0 and _cacheable(value):
+                    await cache.aset(_cache_key(name), value, ttl)
+                    await cache.aset(_stale_key(name), value, settings.UPSTREAM_STALE_TTL)
+                return value
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            ttl = _ttl(name)
+            if ttl > 0:
+                value = cache.get(_cache_key(name))
+                if value is not None:
+                    return value
+            try:
+                value = method(*args, **kwargs)
+            except UNAVAILABLE_ERRORS:
+                stale = cache.get(_stale_key(name))
+                if stale is None:
+                    raise
+                return stale
+            if ttl > 0 and _cacheable(value):
+                cache.set(_cache_key(name), value, ttl)
+                cache.set(_stale_key(name), value, settings.UPSTREAM_STALE_TTL)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidate(*names: str) -> None:
+    cache.delete_many([_cache_key(name) for name in names])
+
+
+async def ainvalidate(*names: str) -> None:
+    await cache.adelete_many([_cache_key(name) for name in names])
@@ -20,6 +20,10 @@ Architecture:
 - This file contains utility classes that wrap HTTP calls to the external services
 - Each class (TradeExternalApis, ClassifierExternalApis) encapsulates related endpoints
 - All API calls return JSON responses as Python dictionaries
+- HTTP calls go through shared, pooled keep-alive sessions (see http_pool.py)
+- Async twins of both classes live in async_api_utils.py for code running on an event loop
+- Channel and exchange lists are cached in Django's cache (see api_cache.py)
+- Every public method is counted and timed for /metrics (see metrics.py)
 - Type hints are used throughout for better code clarity and IDE support
 
 Note: This is part of a larger Django project that combines views from multiple 
@@ -27,11 +31,14 @@ microservices into a single interface. The main Django app serves as an aggregat
 and UI layer on top of these specialized services.
 """
 
-import requests
 from typing import Dict, Any, Optional, List
 import os
 import time
+from .api_cache import cached_read, invalidate
+from .http_pool import get_session
+from .metrics import instrument_api
 
+@instrument_api('trade')
 class TradeExternalApis:
     """
     Utility class to interact with external trading APIs.
@@ -43,54 +50,55 @@ class TradeExternalApis:
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        self.session = get_session("trade", self.TRADE_BASE_URL)
 
     # Users
     def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/users/"
-        response = requests.post(url, json=user_data, headers=self.headers)
+        response = self.session.post(url, json=user_data, headers=self.headers)
         return response.json()
 
     def get_users(self, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/users/"
         params = {"skip": skip, "limit": limit}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def get_user(self, username: str) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/users/{username}"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url, headers=self.headers)
         return response.json()
 
     def update_user(self, username: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/users/{username}"
-        response = requests.put(url, json=user_data, headers=self.headers)
+        response = self.session.put(url, json=user_data, headers=self.headers)
         return response.json()
 
     # Trading Accounts
     def create_trading_account(self, account_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/accounts/"
-        response = requests.post(url, json=account_data, headers=self.headers)
+        response = self.session.post(url, json=account_data, headers=self.headers)
         return response.json()
 
     def get_user_accounts(self, username: str) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/accounts/user/{username}"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url, headers=self.headers)
         return response.json()
 
     def get_trading_account(self, account_id: int) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/accounts/{account_id}"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url, headers=self.headers)
         return response.json()
 
     def update_trading_account(self, account_id: int, account_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/accounts/{account_id}"
-        response = requests.put(url, json=account_data, headers=self.headers)
+        response = self.session.put(url, json=account_data, headers=self.headers)
         return response.json()
 
     def verify_trading_account(self, account_id: int, verified: bool) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/accounts/{account_id}/verify"
         params = {"verified": verified}
-        response = requests.post(url, headers=self.headers, params=params)
+        response = self.session.post(url, headers=self.headers, params=params)
         return response.json()
 
     # Trades
@@ -98,56 +106,56 @@ class TradeExternalApis:
                            start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/trades/account/{account_id}"
         params = {"skip": skip, "limit": limit, "start_date": start_date, "end_date": end_date}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def get_user_trades(self, username: str, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/trades/user/{username}"
         params = {"skip": skip, "limit": limit}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def get_account_trade_stats(self, account_id: int, period: str = "all") -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/trades/stats/account/{account_id}"
         params = {"period": period}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     # Binance Spot
     def get_binance_account_info(self, account_id: int) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/binance/spot/account"
         params = {"account_id": account_id}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def get_binance_balance(self, account_id: int, asset: str) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/binance/spot/balance/{asset}"
         params = {"account_id": account_id}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def create_binance_order(self, account_id: int, order_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/binance/spot/order"
         params = {"account_id": account_id}
-        response = requests.post(url, json=order_data, headers=self.headers, params=params)
+        response = self.session.post(url, json=order_data, headers=self.headers, params=params)
         return response.json()
 
     def get_binance_orders(self, account_id: int, symbol: str, status: str = "all", limit: int = 50) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/binance/spot/orders/{symbol}"
         params = {"account_id": account_id, "status": status, "limit": limit}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     # MEXC Spot
     def get_mexc_account_info(self, account_id: int) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/account"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url, headers=self.headers)
         return response.json()
 
     def get_mexc_balance(self, account_id: int, asset: Optional[str] = None) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/balance"
         params = {"asset": asset} if asset else {}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def create_mexc_order(self, account_id: int, order_data: Dict[str, Any], max_retries: int = 3) -> Dict[str, Any]:
@@ -155,7 +163,7 @@ class TradeExternalApis:
         attempt = 1
         
         while attempt <= max_retries:
-            response = requests.post(url, json=order_data, headers=self.headers)
+            response = self.session.post(url, json=order_data, headers=self.headers)
             status_code = response.status_code
             response_data = response.json()
             
@@ -182,104 +190,116 @@ class TradeExternalApis:
 
     def cancel_mexc_order(self, account_id: int, symbol: str, order_id: str) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/order/{symbol}/{order_id}"
-        response = requests.delete(url, headers=self.headers)
+        response = self.session.delete(url, headers=self.headers)
         return response.json()
 
     def get_mexc_order_history(self, account_id: int, symbol: Optional[str] = None, limit: int = 500,
                                from_id: Optional[str] = None) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/orders"
         params = {"symbol": symbol, "limit": limit, "from_id": from_id}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def get_mexc_open_orders(self, account_id: int, symbol: Optional[str] = None) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/open-orders"
         params = {"symbol": symbol} if symbol else {}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def get_mexc_orderbook(self, account_id: int, symbol: str, limit: int = 100) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/orderbook/{symbol}"
         params = {"limit": limit}
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, headers=self.headers, params=params)
         return response.json()
 
     def test_mexc_order(self, account_id: int, order_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/order/test"
-        response = requests.post(url, json=order_data, headers=self.headers)
+        response = self.session.post(url, json=order_data, headers=self.headers)
         return response.json()
 
 
 
+@instrument_api('classifier')
 class ClassifierExternalApis:
     """
     Utility class to interact with the Telegram Token Tracker API.
     """
     environment = os.getenv("ENVIRONMENT")
     CLASSIFIER_BASE_URL = os.getenv("DEV_CLASSIFIER_API_URL") if environment == "development" else os.getenv("CLASSIFIER_API_URL")
+    session = get_session("classifier", CLASSIFIER_BASE_URL, warm_path="/health")
 
     # Health Check
     def health_check(self) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/health"
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.json()
 
     # Channels
     def add_channel(self, channel_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/channel/"
-        response = requests.post(url, json=channel_data)
+        response = self.session.post(url, json=channel_data)
+        if response.ok:
+            invalidate('channels')
         return response.json()
 
     def delete_channel(self, channel_id: int) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/channel/{channel_id}"
-        response = requests.delete(url)
+        response = self.session.delete(url)
+        if response.ok:
+            invalidate('channels')
         return response.json()
 
     def get_channel(self, channel_id: int) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/channel/{channel_id}"
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.json()
 
+    @cached_read('channels')
     def get_all_channels(self) -> List[Dict[str, Any]]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/channels/"
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.json()
 
     # Exchanges
     def add_exchange(self, exchange_data: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/exchange/"
-        response = requests.post(url, json=exchange_data)
+        response = self.session.post(url, json=exchange_data)
+        if response.ok:
+            invalidate('exchanges')
         return response.json()
 
     def delete_exchange(self, exchange_id: int) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/exchange/{exchange_id}"
-        response = requests.delete(url)
+        response = self.session.delete(url)
+        if response.ok:
+            invalidate('exchanges')
         return response.json()
 
     def get_exchange(self, exchange_id: int) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/exchange/{exchange_id}"
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.json()
 
+    @cached_read('exchanges')
     def get_all_exchanges(self) -> List[Dict[str, Any]]:
         url = f"{self.CLASSIFIER_BASE_URL}/config/exchanges/"
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.json()
 
     # Tokens
     def get_tokens(self, exchange: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
         url = f"{self.CLASSIFIER_BASE_URL}/tokens/"
         params = {"exchange": exchange, "limit": limit}
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
         return response.json()
 
     def get_token(self, token_id: int) -> Dict[str, Any]:
         url = f"{self.CLASSIFIER_BASE_URL}/tokens/{token_id}"
-        response = requests.get(url)
+        response = self.session.get(url)
         return response.json()
 
     def get_latest_tokens(self, limit: int = 10) -> List[Dict[str, Any]]:
         url = f"{self.CLASSIFIER_BASE_URL}/tokens/latest/"
         params = {"limit": limit}
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
         return response.json()
@@ -8,6 +8,7 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
 import os
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
@@ -19,6 +20,11 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'the_combiner_view.settings')
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
+# Only the server process runs the upstream ingest and pool keep-alive
+if settings.START_BACKGROUND_SERVICES:
+    from trading.startup import start_services
+    start_services()
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
@@ -0,0 +1,377 @@
+"""
+Asyncio twins of the external API clients in api_utils.py.
+
+AsyncTradeExternalApis and AsyncClassifierExternalApis expose the same method
+surface as TradeExternalApis and ClassifierExternalApis, but every method is a
+coroutine. They are meant for code already running on an event loop (async
+consumers, async views, the automation path under Daphne) so upstream calls do
+not block the loop or need a sync_to_async thread hop.
+
+Connections come from one httpx.AsyncClient per upstream and per event loop,
+sized and timed with the same settings as the synchronous pools in
+http_pool.py. Clients are bound to the loop that created them, so a loop that
+goes away (e.g. one created by async_to_sync) takes its clients with it.
+"""
+
+import asyncio
+import os
+import weakref
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from .api_cache import cached_read, ainvalidate
+from .http_pool import HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_SINGLE_FLIGHT
+from .circuit_breaker import FAILURE_STATUS_CODES, get_breaker
+from .metrics import instrument_api, record_response_status
+from .single_flight import AsyncSingleFlight, flight_key
+
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+
+_flights = AsyncSingleFlight()
+
+
+class UpstreamAsyncClient(httpx.AsyncClient):
+    """
+    AsyncClient where identical concurrent GETs share one upstream call and
+    every call goes through the upstream's circuit breaker.
+    """
+    def __init__(self, name: str, **kwargs):
+        super().__init__(**kwargs)
+        self.breaker = get_breaker(name)
+
+    async def send(self, request, **kwargs):
+        self.breaker.before_call()
+        try:
+            response = await super().send(request, **kwargs)
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        record_response_status(response.status_code)
+        if response.status_code in FAILURE_STATUS_CODES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def request(self, method, url, *, params=None, **kwargs):
+        if HTTP_SINGLE_FLIGHT and method.upper() == "GET":
+            key = flight_key(method, str(url), params)
+            return await _flights.do(
+                key, lambda: super(UpstreamAsyncClient, self).request(method, url, params=params, **kwargs)
+            )
+        return await super().request(method, url, params=params, **kwargs)
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient for an upstream on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        client = UpstreamAsyncClient(
+            name,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+        clients[name] = client
+    return client
+
+
+async def close_async_clients() -> None:
+    """
+    Close every client bound to the running event loop.
+    """
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def _params(params: Dict[str, Any]) -> Dict[str, Any]:
+    # requests silently drops None values, httpx would send them as "key="
+    return {key: value for key, value in params.items() if value is not None}
+
+
+@instrument_api('trade')
+class AsyncTradeExternalApis:
+    """
+    Async utility class to interact with external trading APIs.
+    """
+    def __init__(self):
+        self.environment = os.getenv("ENVIRONMENT")
+        self.TRADE_BASE_URL = os.getenv("DEV_TRADE_API_URL") if self.environment == "development" else os.getenv("TRADE_API_URL")
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return get_async_client("trade")
+
+    # Users
+    async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/users/"
+        response = await self.client.post(url, json=user_data, headers=self.headers)
+        return response.json()
+
+    async def get_users(self, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/users/"
+        params = {"skip": skip, "limit": limit}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def get_user(self, username: str) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/users/{username}"
+        response = await self.client.get(url, headers=self.headers)
+        return response.json()
+
+    async def update_user(self, username: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/users/{username}"
+        response = await self.client.put(url, json=user_data, headers=self.headers)
+        return response.json()
+
+    # Trading Accounts
+    async def create_trading_account(self, account_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/accounts/"
+        response = await self.client.post(url, json=account_data, headers=self.headers)
+        return response.json()
+
+    async def get_user_accounts(self, username: str) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/accounts/user/{username}"
+        response = await self.client.get(url, headers=self.headers)
+        return response.json()
+
+    async def get_trading_account(self, account_id: int) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/accounts/{account_id}"
+        response = await self.client.get(url, headers=self.headers)
+        return response.json()
+
+    async def update_trading_account(self, account_id: int, account_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/accounts/{account_id}"
+        response = await self.client.put(url, json=account_data, headers=self.headers)
+        return response.json()
+
+    async def verify_trading_account(self, account_id: int, verified: bool) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/accounts/{account_id}/verify"
+        # requests serializes booleans as "True"/"False", keep the same wire format
+        params = {"verified": str(verified)}
+        response = await self.client.post(url, headers=self.headers, params=params)
+        return response.json()
+
+    # Trades
+    async def get_account_trades(self, account_id: int, skip: int = 0, limit: int = 100,
+                                 start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/trades/account/{account_id}"
+        params = {"skip": skip, "limit": limit, "start_date": start_date, "end_date": end_date}
+        response = await self.client.get(url, headers=self.headers, params=_params(params))
+        return response.json()
+
+    async def get_user_trades(self, username: str, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/trades/user/{username}"
+        params = {"skip": skip, "limit": limit}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def get_account_trade_stats(self, account_id: int, period: str = "all") -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/trades/stats/account/{account_id}"
+        params = {"period": period}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    # Binance Spot
+    async def get_binance_account_info(self, account_id: int) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/binance/spot/account"
+        params = {"account_id": account_id}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def get_binance_balance(self, account_id: int, asset: str) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/binance/spot/balance/{asset}"
+        params = {"account_id": account_id}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def create_binance_order(self, account_id: int, order_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/binance/spot/order"
+        params = {"account_id": account_id}
+        response = await self.client.post(url, json=order_data, headers=self.headers, params=params)
+        return response.json()
+
+    async def get_binance_orders(self, account_id: int, symbol: str, status: str = "all", limit: int = 50) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/binance/spot/orders/{symbol}"
+        params = {"account_id": account_id, "status": status, "limit": limit}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    # MEXC Spot
+    async def get_mexc_account_info(self, account_id: int) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/account"
+        response = await self.client.get(url, headers=self.headers)
+        return response.json()
+
+    async def get_mexc_balance(self, account_id: int, asset: Optional[str] = None) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/balance"
+        params = {"asset": asset} if asset else {}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def create_mexc_order(self, account_id: int, order_data: Dict[str, Any], max_retries: int = 3) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/order"
+        attempt = 1
+
+        while attempt <= max_retries:
+            response = await self.client.post(url, json=order_data, headers=self.headers)
+            status_code = response.status_code
+            response_data = response.json()
+
+            # Add metadata to help frontend handle the response
+            response_data['_metadata'] = {
+                'attempt': attempt,
+                'status_code': status_code,
+                'symbol': order_data.get('symbol'),
+                'amount': order_data.get('quote_order_qty')
+            }
+
+            # Success case
+            if status_code == 200:
+                return response_data
+
+            # Retry cases (400 and 502)
+            if status_code in [400, 502] and attempt < max_retries:
+                attempt += 1
+                await asyncio.sleep(0.1)
+                continue
+
+            # Return last failed attempt
+            return response_data
+
+    async def cancel_mexc_order(self, account_id: int, symbol: str, order_id: str) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/order/{symbol}/{order_id}"
+        response = await self.client.delete(url, headers=self.headers)
+        return response.json()
+
+    async def get_mexc_order_history(self, account_id: int, symbol: Optional[str] = None, limit: int = 500,
+                                     from_id: Optional[str] = None) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/orders"
+        params = {"symbol": symbol, "limit": limit, "from_id": from_id}
+        response = await self.client.get(url, headers=self.headers, params=_params(params))
+        return response.json()
+
+    async def get_mexc_open_orders(self, account_id: int, symbol: Optional[str] = None) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/open-orders"
+        params = {"symbol": symbol} if symbol else {}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def get_mexc_orderbook(self, account_id: int, symbol: str, limit: int = 100) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/orderbook/{symbol}"
+        params = {"limit": limit}
+        response = await self.client.get(url, headers=self.headers, params=params)
+        return response.json()
+
+    async def test_mexc_order(self, account_id: int, order_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.TRADE_BASE_URL}/mexc/spot/{account_id}/order/test"
+        response = await self.client.post(url, json=order_data, headers=self.headers)
+        return response.json()
+
+
+@instrument_api('classifier')
+class AsyncClassifierExternalApis:
+    """
+    Async utility class to interact with the Telegram Token Tracker API.
+    """
+    environment = os.getenv("ENVIRONMENT")
+    CLASSIFIER_BASE_URL = os.getenv("DEV_CLASSIFIER_API_URL") if environment == "development" else os.getenv("CLASSIFIER_API_URL")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return get_async_client("classifier")
+
+    # Health Check
+    async def health_check(self) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/health"
+        response = await self.client.get(url)
+        return response.json()
+
+    # Channels
+    async def add_channel(self, channel_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/channel/"
+        response = await self.client.post(url, json=channel_data)
+        if response.is_success:
+            await ainvalidate('channels')
+        return response.json()
+
+    async def delete_channel(self, channel_id: int) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/channel/{channel_id}"
+        response = await self.client.delete(url)
+        if response.is_success:
+            await ainvalidate('channels')
+        return response.json()
+
+    async def get_channel(self, channel_id: int) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/channel/{channel_id}"
+        response = await self.client.get(url)
+        return response.json()
+
+    @cached_read('channels')
+    async def get_all_channels(self) -> List[Dict[str, Any]]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/channels/"
+        response = await self.client.get(url)
+        return response.json()
+
+    # Exchanges
+    async def add_exchange(self, exchange_data: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/exchange/"
+        response = await self.client.post(url, json=exchange_data)
+        if response.is_success:
+            await ainvalidate('exchanges')
+        return response.json()
+
+    async def delete_exchange(self, exchange_id: int) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/exchange/{exchange_id}"
+        response = await self.client.delete(url)
+        if response.is_success:
+            await ainvalidate('exchanges')
+        return response.json()
+
+    async def get_exchange(self, exchange_id: int) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/exchange/{exchange_id}"
+        response = await self.client.get(url)
+        return response.json()
+
+    @cached_read('exchanges')
+    async def get_all_exchanges(self) -> List[Dict[str, Any]]:
+        url = f"{self.CLASSIFIER_BASE_URL}/config/exchanges/"
+        response = await self.client.get(url)
+        return response.json()
+
+    # Tokens
+    async def get_tokens(self, exchange: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        url = f"{self.CLASSIFIER_BASE_URL}/tokens/"
+        params = {"exchange": exchange, "limit": limit}
+        response = await self.client.get(url, params=_params(params))
+        return response.json()
+
+    async def get_token(self, token_id: int) -> Dict[str, Any]:
+        url = f"{self.CLASSIFIER_BASE_URL}/tokens/{token_id}"
+        response = await self.client.get(url)
+        return response.json()
+
+    async def get_latest_tokens(self, limit: int = 10) -> List[Dict[str, Any]]:
+        url = f"{self.CLASSIFIER_BASE_URL}/tokens/latest/"
+        params = {"limit": limit}
+        response = await self.client.get(url, params=params)
+        return response.json()
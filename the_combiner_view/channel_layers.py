@@ -0,0 +1,28 @@
+"""
+In-process channel layer for single-worker deployments (no REDIS_URL).
+
+Channels' InMemoryChannelLayer sweeps every channel queue and group for
+expired entries on each receive() and group_send(). Every dashboard socket
+waits in receive(), so one broadcast to N sockets costs O(N^2) and a few
+hundred connections saturate the worker. LocalChannelLayer runs the same
+sweep at most once per ``clean_interval`` seconds; expiry only needs to be
+approximate.
+"""
+
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+
+class LocalChannelLayer(InMemoryChannelLayer):
+    def __init__(self, clean_interval: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.clean_interval = clean_interval
+        self._last_clean = 0.0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self._last_clean < self.clean_interval:
+            return
+        self._last_clean = now
+        super()._clean_expired()
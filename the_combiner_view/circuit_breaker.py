@@ -0,0 +1,155 @@
+"""
+Per-upstream circuit breakers for the trading and classifier APIs.
+
+Every call made through the pooled clients (http_pool.py, async_api_utils.py)
+passes through the breaker of its upstream:
+- closed: calls go through; consecutive transport failures (connection
+  errors, timeouts, 503/504) are counted
+- open: after CIRCUIT_FAILURE_THRESHOLD failures calls fail immediately
+  with CircuitOpenError instead of waiting on a dead service
+- half_open: after CIRCUIT_RECOVERY_TIMEOUT seconds a single trial call is
+  let through; success closes the breaker, failure opens it again
+
+CircuitOpenError subclasses requests' ConnectionError so existing callers
+fall into their "unable to connect" handling, and cached reads fall back to
+their last known value (see api_cache.py).
+
+Configuration (environment variables):
+- CIRCUIT_FAILURE_THRESHOLD: consecutive failures before opening (default 5)
+- CIRCUIT_RECOVERY_TIMEOUT: seconds to stay open before a trial (default 15)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RECOVERY_TIMEOUT = float(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", "15"))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Upstream is overloaded or unreachable behind its proxy. Other errors
+# (e.g. an exchange rejecting an order with 400/502) are normal responses
+FAILURE_STATUS_CODES = {503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 recovery_timeout: float = CIRCUIT_RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        Raise CircuitOpenError if the call must not go to the upstream.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    raise CircuitOpenError(f"{self.name} API circuit is open")
+                changed = self._set_state(HALF_OPEN)
+            else:
+                changed = None
+            if self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name} API circuit is half-open, trial call in flight")
+            self._trial_in_flight = True
+        self._notify(changed)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            changed = self._set_state(CLOSED)
+        self._notify(changed)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            changed = None
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                changed = self._set_state(OPEN)
+        self._notify(changed)
+
+    def release(self) -> None:
+        """
+        End a call that failed for reasons unrelated to the upstream's health.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _set_state(self, state: str):
+        if self._state == state:
+            return None
+        previous, self._state = self._state, state
+        return previous, state
+
+    def _notify(self, changed) -> None:
+        # Runs outside the lock: listeners may read breaker states or broadcast
+        if changed is None:
+            return
+        logger.warning(f"Circuit breaker for {self.name} API: {changed[0]} -> {changed[1]}")
+        for listener in list(_listeners):
+            try:
+                listener(self)
+            except Exception as e:
+                logger.error(f"Circuit breaker listener failed: {e}", exc_info=True)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_listeners: List[Callable[[CircuitBreaker], None]] = []
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breaker_states() -> Dict[str, str]:
+    """
+    Current state of every upstream breaker, e.g. {'trade': 'closed'}.
+    """
+    return {name: breaker.state for name, breaker in list(_breakers.items())}
+
+
+def add_listener(listener: Callable[[CircuitBreaker], None]) -> None:
+    """
+    Call ``listener(breaker)`` on every state change. Listeners run inline on
+    the thread or event loop that made the failing/succeeding call.
+    """
+    _listeners.append(listener)
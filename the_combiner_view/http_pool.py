@@ -0,0 +1,187 @@
+"""
+Process-wide HTTP connection pools for the external service clients.
+
+TradeExternalApis and ClassifierExternalApis only ever talk to a couple of
+hosts (the trading API on 8082 and the classifier API on 8083), so instead of
+opening a fresh TCP connection for every call they share one pooled
+``requests.Session`` per upstream. Connections are kept alive at the HTTP and
+TCP level, pre-warmed at startup and pinged periodically so the first order
+after a quiet period does not pay for connection setup.
+
+Configuration (environment variables):
+- HTTP_POOL_MAXSIZE: connections kept per host (default 20)
+- HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT: seconds (default 3.05 / 10)
+- HTTP_KEEPALIVE_INTERVAL: seconds between keep-alive pings, 0 disables (default 30)
+- HTTP_PREWARM_CONNECTIONS: connections opened per host at startup (default 2)
+- HTTP_SINGLE_FLIGHT: coalesce identical concurrent GETs into one call (default 1)
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from .circuit_breaker import FAILURE_STATUS_CODES, get_breaker
+from .metrics import record_response_status
+from .single_flight import SingleFlight, flight_key
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_KEEPALIVE_INTERVAL = float(os.getenv("HTTP_KEEPALIVE_INTERVAL", "30"))
+HTTP_PREWARM_CONNECTIONS = int(os.getenv("HTTP_PREWARM_CONNECTIONS", "2"))
+HTTP_SINGLE_FLIGHT = os.getenv("HTTP_SINGLE_FLIGHT", "1") == "1"
+
+
+def _keepalive_socket_options() -> List[Tuple[int, int, int]]:
+    """
+    TCP keep-alive options so idle pooled sockets are not silently dropped by
+    NAT/conntrack between containers. TCP_KEEP* are Linux specific.
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 20))
+    if hasattr(socket, "TCP_KEEPCNT"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3))
+    return options
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that enables TCP keep-alive on every pooled connection.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = _keepalive_socket_options()
+        super().init_poolmanager(*args, **kwargs)
+
+
+_flights = SingleFlight()
+
+
+class UpstreamSession(requests.Session):
+    """
+    Pooled session for a single upstream service with default timeouts.
+    Identical concurrent GETs share one upstream call (see single_flight.py)
+    and every call goes through the upstream's circuit breaker.
+    """
+    def __init__(self, name: str, base_url: Optional[str], warm_path: str = "/"):
+        super().__init__()
+        self.name = name
+        self.base_url = base_url
+        self.warm_path = warm_path
+        self.timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.headers.update({"Connection": "keep-alive"})
+        self.breaker = get_breaker(name)
+
+        adapter = KeepAliveAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if HTTP_SINGLE_FLIGHT and method.upper() == "GET" and not kwargs.get("stream"):
+            key = flight_key(method, url, kwargs.get("params"))
+            return _flights.do(key, lambda: self._read(method, url, **kwargs))
+        return super().request(method, url, **kwargs)
+
+    def send(self, request, **kwargs):
+        self.breaker.before_call()
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self.breaker.release()
+            raise
+        record_response_status(response.status_code)
+        if response.status_code in FAILURE_STATUS_CODES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _read(self, method, url, **kwargs):
+        response = super().request(method, url, **kwargs)
+        # Load the body before the response is handed to several threads
+        response.content
+        return response
+
+    def ping(self) -> None:
+        """
+        Issue a cheap request so a pooled connection is opened (or kept) alive.
+        Any HTTP response is fine, only the socket matters.
+        """
+        if not self.base_url:
+            return
+        try:
+            # Bypass single-flight, concurrent pings must open separate connections
+            self._read("GET", f"{self.base_url}{self.warm_path}", timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Keep-alive ping to {self.name} failed: {e}")
+
+
+_sessions: Dict[str, UpstreamSession] = {}
+_sessions_lock = threading.Lock()
+_keepalive_thread: Optional[threading.Thread] = None
+
+
+def get_session(name: str, base_url: Optional[str], warm_path: str = "/") -> UpstreamSession:
+    """
+    Return the shared session for an upstream, creating it on first use.
+    """
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = UpstreamSession(name, base_url, warm_path)
+            _sessions[name] = session
+        return session
+
+
+def prewarm(connections: int = HTTP_PREWARM_CONNECTIONS) -> None:
+    """
+    Open ``connections`` concurrent connections to every registered upstream.
+    """
+    threads = []
+    for session in list(_sessions.values()):
+        for _ in range(connections):
+            thread = threading.Thread(target=session.ping, daemon=True)
+            thread.start()
+            threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+
+def _keepalive_loop() -> None:
+    prewarm()
+    logger.info(f"HTTP pools warmed for: {', '.join(_sessions) or 'none'}")
+    while HTTP_KEEPALIVE_INTERVAL > 0:
+        time.sleep(HTTP_KEEPALIVE_INTERVAL)
+        prewarm()
+
+
+def start_keepalive() -> None:
+    """
+    Pre-warm all pools and keep them warm from a background thread.
+    Safe to call more than once.
+    """
+    global _keepalive_thread
+    with _sessions_lock:
+        if _keepalive_thread is not None:
+            return
+        _keepalive_thread = threading.Thread(target=_keepalive_loop, name="http-keepalive", daemon=True)
+        _keepalive_thread.start()
@@ -0,0 +1,132 @@
+"""
+Non-blocking, structured log output.
+
+Every handler configured in settings.LOGGING is a QueueLogHandler: the
+logging call only merges the message and puts the record on a bounded
+in-memory queue; formatting and the write to stdout happen on a listener
+thread. A burst of records never stalls the upstream reader or the
+automation workers on a slow stdout (e.g. Docker's log driver). When the
+queue is full records are dropped and counted rather than waited for.
+
+Records are written as one JSON object per line (JsonFormatter) or as plain
+text, see LOG_FORMAT in settings.py. Attributes passed with ``extra=`` are
+included as fields of the JSON object.
+
+DebugSampler lets only every Nth DEBUG record through, for per-comparison
+tracing that is too chatty to keep in full.
+"""
+
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+# Attributes of every LogRecord, anything else came in through ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    Pass one DEBUG record out of every ``every``; other levels always pass.
+    """
+    def __init__(self, every: int = 100):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        # Racy across threads on purpose, an occasional extra or missing
+        # sample is cheaper than a lock on every debug call
+        self._seen += 1
+        return (self._seen - 1) % self.every == 0
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Queue-backed handler writing to ``stream`` from a listener thread.
+
+    The listener thread starts with the first record, so importing settings
+    or running django.setup() starts no thread (see check_startup). Records
+    logged after close() (e.g. by finalizers during interpreter shutdown,
+    when no thread can start) are written directly.
+    """
+    def __init__(self, stream=None, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.dropped = 0
+        self._listener = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt) -> None:
+        # The listener formats, the calling thread must not
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, they may change once the caller moves on;
+        # everything else, tracebacks included, is formatted by the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._closed:
+            self.target.handle(record)
+            return
+        if self._listener is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._listener is None and not self._closed:
+                listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                listener.start()
+                listener._thread.name = 'log-writer'
+                self._listener = listener
+
+    def close(self) -> None:
+        # Called by logging.shutdown() at exit: drains the queue first
+        with self._start_lock:
+            self._closed = True
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self.target.close()
+        super().close()
+
+
+def dropped_records() -> int:
+    """
+    Records dropped so far by the root logger's queue handlers.
+    """
+    return sum(handler.dropped for handler in logging.getLogger().handlers if isinstance(handler, QueueLogHandler))
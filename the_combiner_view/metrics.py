@@ -0,0 +1,314 @@
+"""
+Process metrics in the Prometheus text exposition format, served at /metrics.
+
+No client library or exporter is needed: counters, gauges and histograms
+below are plain in-process objects, and collectors registered with
+``register_collector`` turn state that already exists elsewhere (automation
+queue, broadcast counters, latency histograms) into samples at scrape time.
+
+Upstream API calls are measured per method by ``instrument_api``, applied to
+the sync and async API classes: calls by outcome (ok, http_error for 4xx/5xx
+responses, exception) and call duration.
+
+Values are kept per process and every sample carries the ``worker`` label
+(DAPHNE_WORKER_ID). With several Daphne workers (workers.py) a scrape
+through the shared port reaches one of them, so every worker also copies
+its samples to Django's cache (``publish``, on each ingest election tick)
+and ``render_all`` serves the samples of all DAPHNE_WORKERS workers: the
+answering worker's current ones and the others' last published copy, at
+most INGEST_LEADER_INTERVAL seconds old. A worker that stopped publishing
+drops out after the copy's TTL. Only the ingest leader reports ingest and
+automation activity.
+"""
+
+import asyncio
+import bisect
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.core.cache import cache
+
+from .logging_utils import dropped_records
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+WORKER = os.getenv('DAPHNE_WORKER_ID', '0')
+WORKERS = int(os.getenv('DAPHNE_WORKERS', '1'))
+
+SNAPSHOT_KEY = 'metrics:worker:{}'
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Family:
+    """
+    One metric (name, type, help text) and its samples, ready to render.
+    """
+    def __init__(self, name: str, kind: str, documentation: str, samples: Iterable[Sample] = ()):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.samples: List[Sample] = list(samples)
+
+    def add(self, value: float, suffix: str = '', **labels) -> "Family":
+        self.samples.append((suffix, labels, value))
+        return self
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples:
+            labels = {'worker': WORKER, **labels}
+            rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f"{self.name}{suffix}{{{rendered}}} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def collect(self) -> Family:
+        with self._lock:
+            values = dict(self._values)
+        family = Family(self.name, self.kind, self.documentation)
+        for key, value in values.items():
+            family.add(value, **dict(zip(self.labelnames, key)))
+        return family
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts incl. +Inf, sum)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> Family:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        family = Family(self.name, self.kind, self.documentation)
+        for key, (counts, total) in series.items():
+            labels = dict(zip(self.labelnames, key))
+            histogram_samples(family, self.buckets, counts, total, labels)
+        return family
+
+
+def histogram_samples(family: Family, buckets: Sequence[float], counts: Sequence[int],
+                      total: float, labels: Dict[str, str]) -> Family:
+    """
+    Add cumulative ``_bucket``, ``_sum`` and ``_count`` samples for one series.
+    ``counts`` holds per-bucket (not cumulative) counts, +Inf last.
+    """
+    cumulative = 0
+    for bound, count in zip([*buckets, float('inf')], counts):
+        cumulative += count
+        family.add(cumulative, '_bucket', **labels, le=_format_value(bound))
+    family.add(total, '_sum', **labels)
+    family.add(cumulative, '_count', **labels)
+    return family
+
+
+_metrics: List[_Metric] = []
+_collectors: List[Callable[[], Iterable[Family]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[Family]]) -> None:
+    """
+    Call ``collector()`` on every scrape; it returns the families to expose.
+    """
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def collect() -> List[Family]:
+    families = [metric.collect() for metric in _metrics]
+    for collector in list(_collectors):
+        families.extend(collector())
+    return families
+
+
+def render(families: Optional[Iterable[Family]] = None) -> str:
+    families = collect() if families is None else families
+    return '\n'.join(family.render() for family in families) + '\n'
+
+
+def publish(ttl: float) -> None:
+    """
+    Copy this worker's samples to the cache for ``render_all`` in other workers.
+    """
+    snapshot = [
+        (family.name, family.kind, family.documentation,
+         [(suffix, {'worker': WORKER, **labels}, value) for suffix, labels, value in family.samples])
+        for family in collect()
+    ]
+    cache.set(SNAPSHOT_KEY.format(WORKER), snapshot, ttl)
+
+
+def render_all(workers: int = WORKERS) -> str:
+    """
+    Samples of every worker, each family once with the series of all workers.
+    """
+    merged: Dict[str, Family] = {family.name: family for family in collect()}
+    others = [SNAPSHOT_KEY.format(worker) for worker in range(workers) if str(worker) != WORKER]
+    for snapshot in cache.get_many(others).values() if others else ():
+        for name, kind, documentation, samples in snapshot:
+            family = merged.setdefault(name, Family(name, kind, documentation))
+            family.samples.extend(samples)
+    return render(merged.values())
+
+
+# Upstream API calls
+
+upstream_calls = Counter(
+    'combiner_upstream_calls_total', 'Upstream API calls by method and outcome.',
+    ('api', 'method', 'outcome'),
+)
+upstream_call_seconds = Histogram(
+    'combiner_upstream_call_duration_seconds', 'Upstream API call duration, retries included.',
+    ('api', 'method'),
+)
+
+# Holds the worst HTTP status seen during the current API method call
+_call_status: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar('upstream_call_status', default=None)
+
+
+def record_response_status(status_code: int) -> None:
+    """
+    Called by the HTTP clients for every response of an instrumented call.
+    """
+    holder = _call_status.get()
+    if holder is not None and status_code > holder[0]:
+        holder[0] = status_code
+
+
+def _outcome(holder: List[int], error: bool) -> str:
+    if error:
+        return 'exception'
+    return 'http_error' if holder[0] >= 400 else 'ok'
+
+
+def _instrument(api: str, name: str, method: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            holder = [0]
+            token = _call_status.set(holder)
+            started = time.monotonic()
+            error = True
+            try:
+                result = await method(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _call_status.reset(token)
+                upstream_calls.inc(api, name, _outcome(holder, error))
+                upstream_call_seconds.observe(time.monotonic() - started, api, name)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        holder = [0]
+        token = _call_status.set(holder)
+        started = time.monotonic()
+        error = True
+        try:
+            result = method(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            _call_status.reset(token)
+            upstream_calls.inc(api, name, _outcome(holder, error))
+            upstream_call_seconds.observe(time.monotonic() - started, api, name)
+    return wrapper
+
+
+def instrument_api(api: str) -> Callable[[type], type]:
+    """
+    Class decorator measuring every public method of an API client class.
+    """
+    def decorator(cls: type) -> type:
+        for name, member in list(vars(cls).items()):
+            if name.startswith('_') or not inspect.isfunction(member):
+                continue
+            setattr(cls, name, _instrument(api, name, member))
+        return cls
+    return decorator
+
+
+def _logging_families() -> List[Family]:
+    return [Family('combiner_log_records_dropped_total', 'counter',
+                   'Log records dropped because the log queue was full.').add(dropped_records())]
+
+
+register_collector(_logging_families)
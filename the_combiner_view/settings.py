@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -140,8 +141,158 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Add Channels configuration
 ASGI_APPLICATION = 'the_combiner_view.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+# Channel layer and cache backend. Without REDIS_URL everything stays in
+# process memory, which only supports a single Daphne worker. With REDIS_URL
+# (e.g. redis://redis:6379/0) group sends and cached upstream reads are shared
+# by every worker, see the_combiner_view/workers.py
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Redis channel layer tuning. Token signals are useless once they are a few
+# seconds old, so undelivered messages expire quickly instead of piling up
+# behind a slow consumer. CHANNEL_LAYER_CAPACITY is per channel
+CHANNEL_LAYER_CONFIG = {
+    'capacity': int(os.getenv('CHANNEL_LAYER_CAPACITY', '500')),
+    'expiry': int(os.getenv('CHANNEL_LAYER_EXPIRY', '10')),
+    'group_expiry': int(os.getenv('CHANNEL_LAYER_GROUP_EXPIRY', '86400')),
+    'prefix': os.getenv('CHANNEL_LAYER_PREFIX', 'combiner'),
+}
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                **CHANNEL_LAYER_CONFIG,
+            },
+        }
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL', REDIS_URL),
+            'KEY_PREFIX': CHANNEL_LAYER_CONFIG['prefix'],
+        }
     }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'the_combiner_view.channel_layers.LocalChannelLayer'
+        }
+    }
+
+# Background services (HTTP pool keep-alive, upstream ingest) start when the
+# ASGI application is loaded, never from manage.py commands. Set
+# START_BACKGROUND_SERVICES=0 to serve without them. STARTUP_BUDGET_MS is the
+# time app loading and service startup should each stay under
+# (see manage.py check_startup)
+START_BACKGROUND_SERVICES = os.getenv('START_BACKGROUND_SERVICES', '1') == '1'
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '1000'))
+
+# Ingest leader election, see trading/leader.py. Exactly one process reads the
+# upstream feed and runs automation. INGEST_LEADER_BACKEND is 'auto', 'redis',
+# 'file' or 'none'. A dead leader is replaced within INGEST_LEADER_INTERVAL
+# seconds (file lock) or INGEST_LEADER_TTL + INGEST_LEADER_INTERVAL (Redis)
+INGEST_LEADER_BACKEND = os.getenv('INGEST_LEADER_BACKEND', 'auto')
+INGEST_LEADER_LOCK_FILE = os.getenv(
+    'INGEST_LEADER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'the_combiner_view-ingest.lock')
+)
+INGEST_LEADER_TTL = float(os.getenv('INGEST_LEADER_TTL', '10'))
+INGEST_LEADER_INTERVAL = float(os.getenv('INGEST_LEADER_INTERVAL', '2'))
+
+# Upstream feed reconnect backoff in seconds: a random delay up to
+# INGEST_RECONNECT_BASE * 2^attempt, capped at INGEST_RECONNECT_MAX
+INGEST_RECONNECT_BASE = float(os.getenv('INGEST_RECONNECT_BASE', '0.5'))
+INGEST_RECONNECT_MAX = float(os.getenv('INGEST_RECONNECT_MAX', '30'))
+
+# Append every upstream frame with its arrival time to this file, for
+# `manage.py replay_ingest` (see trading/recording.py). Empty disables
+INGEST_RECORD_PATH = os.getenv('INGEST_RECORD_PATH', '')
+
+# Dashboard broadcast coalescing, see trading/broadcast.py. Upstream frames
+# and per-socket writes are merged into one array frame per window; 0 sends
+# every frame on its own. A socket's outbox keeps at most
+# BROADCAST_CLIENT_MAX_FRAMES frames, dropping the oldest token frames
+BROADCAST_WINDOW_MS = float(os.getenv('BROADCAST_WINDOW_MS', '50'))
+BROADCAST_CLIENT_MAX_FRAMES = int(os.getenv('BROADCAST_CLIENT_MAX_FRAMES', '200'))
+
+# Logging: records go through a bounded queue and are written by a
+# background thread (see logging_utils.py). LOG_FORMAT is 'json' or 'text';
+# DEBUG records are sampled, one in LOG_DEBUG_SAMPLE_EVERY is kept
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_DEBUG_SAMPLE_EVERY = int(os.getenv('LOG_DEBUG_SAMPLE_EVERY', '100'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'the_combiner_view.logging_utils.JsonFormatter'},
+        'text': {'format': '%(asctime)s %(levelname)-8s %(name)s %(message)s'},
+    },
+    'filters': {
+        'sample_debug': {
+            '()': 'the_combiner_view.logging_utils.DebugSampler',
+            'every': LOG_DEBUG_SAMPLE_EVERY,
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'the_combiner_view.logging_utils.QueueLogHandler',
+            'maxsize': LOG_QUEUE_SIZE,
+            'formatter': LOG_FORMAT,
+            'filters': ['sample_debug'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
+    },
 }
+
+# Who may read /metrics: clients whose address is in METRICS_ALLOWED_IPS
+# (comma-separated addresses or networks), or requests with the header
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set. Everyone
+# else gets 403
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Automation order dispatch
+# 'concurrent' sends every order for a signal at once (bounded by
+# AUTOMATION_MAX_CONCURRENT_ORDERS), 'sequential' sends them one after another
+AUTOMATION_ORDER_DISPATCH = os.getenv('AUTOMATION_ORDER_DISPATCH', 'concurrent')
+AUTOMATION_MAX_CONCURRENT_ORDERS = int(os.getenv('AUTOMATION_MAX_CONCURRENT_ORDERS', '8'))
+
+# Automation ingest queue between the upstream websocket reader and the
+# automation workers. AUTOMATION_QUEUE_OVERFLOW is 'drop_oldest' or 'block'
+AUTOMATION_QUEUE_SIZE = int(os.getenv('AUTOMATION_QUEUE_SIZE', '1000'))
+AUTOMATION_QUEUE_OVERFLOW = os.getenv('AUTOMATION_QUEUE_OVERFLOW', 'drop_oldest')
+AUTOMATION_WORKERS = int(os.getenv('AUTOMATION_WORKERS', '2'))
+
+# Trading-account metadata cache used on the automation order path (seconds)
+ACCOUNT_CACHE_TTL = float(os.getenv('ACCOUNT_CACHE_TTL', '300'))
+ACCOUNT_CACHE_SIZE = int(os.getenv('ACCOUNT_CACHE_SIZE', '1024'))
+ACCOUNT_CACHE_REFRESH_INTERVAL = float(os.getenv('ACCOUNT_CACHE_REFRESH_INTERVAL', '60'))
+
+# Seconds a user's trading-account list is cached for authorization and the
+# accounts views. Invalidated when an account is verified
+USER_ACCOUNTS_CACHE_TTL = int(os.getenv('USER_ACCOUNTS_CACHE_TTL', '30'))
+
+# Deadline in seconds for each upstream section of the dashboard page
+DASHBOARD_SECTION_TIMEOUT = float(os.getenv('DASHBOARD_SECTION_TIMEOUT', '2'))
+
+# Threads shared by all dashboard requests of a process to fetch the page's
+# upstream sections in parallel (three per page)
+DASHBOARD_FETCH_WORKERS = int(os.getenv('DASHBOARD_FETCH_WORKERS', '16'))
+
+# Seconds upstream config reads stay in Django's cache (see api_cache.py).
+# Entries are dropped as soon as a channel or exchange is added or deleted
+UPSTREAM_CACHE_TTLS = {
+    'channels': int(os.getenv('CHANNELS_CACHE_TTL', '300')),
+    'exchanges': int(os.getenv('EXCHANGES_CACHE_TTL', '300')),
+}
+
+# Seconds the last known upstream value is kept for serving while the
+# upstream is unreachable or its circuit breaker is open
+UPSTREAM_STALE_TTL = int(os.getenv('UPSTREAM_STALE_TTL', '86400'))
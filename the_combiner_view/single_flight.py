@@ -0,0 +1,93 @@
+"""
+Request coalescing ("single-flight") for identical concurrent upstream reads.
+
+When several callers ask for the same URL with the same parameters while a
+request for it is already in flight, they wait for that request and all get
+its result instead of each hitting the upstream. Nothing is cached: once the
+call completes, the next identical read goes to the upstream again.
+
+SingleFlight is for threads (the requests based clients), AsyncSingleFlight
+for coroutines on an event loop (the httpx based clients).
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def flight_key(method: str, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple:
+    """
+    Identity of a read: method, URL and the query parameters that are sent.
+    """
+    items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None))
+    return method.upper(), url, items
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Future]]" = weakref.WeakKeyDictionary()
+        self.shared = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+        future = calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            calls[key] = future
+            future.add_done_callback(lambda f: self._finish(calls, key, f))
+        else:
+            self.shared += 1
+        # A waiter giving up (e.g. a dashboard section deadline) must not
+        # cancel the request the other waiters are sharing
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def _finish(calls: Dict[Hashable, asyncio.Future], key: Hashable, future: asyncio.Future) -> None:
+        if calls.get(key) is future:
+            del calls[key]
+        if not future.cancelled():
+            future.exception()  # mark retrieved even if every waiter went away
@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import DashboardView, get_exchanges, get_channels
+from .views import DashboardView, get_exchanges, get_channels, metrics
 from latest_tokens.urls import urlpatterns as latest_tokens_urls
 
 
@@ -26,6 +26,7 @@ urlpatterns = [
     path('', DashboardView.as_view(), name='dashboard'),
     path('get-exchanges/', get_exchanges, name='get_exchanges'),
     path('get-channels/', get_channels, name='get_channels'),
+    path('metrics', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('trading/', include('trading.urls', namespace='trading')),
 ]
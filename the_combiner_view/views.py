@@ -5,43 +5,87 @@ from channel_management.views import ChannelManagementView
 from exchanges.views import ExchangeManagementView
 from django.http import JsonResponse
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseForbidden
 from django.template.context_processors import csrf
 from django.template.context import RequestContext
+from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor, wait
+from . import metrics as process_metrics
+import hmac
+import ipaddress
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Fetches dashboard sections over the pooled keep-alive sessions (http_pool.py).
+# Threads start on first use
+_section_executor = ThreadPoolExecutor(
+    max_workers=settings.DASHBOARD_FETCH_WORKERS,
+    thread_name_prefix="dashboard-section"
+)
+
+_metrics_networks = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in settings.METRICS_ALLOWED_IPS if network.strip()
+]
 
 class DashboardView(View):
     def __init__(self):
         self.channel_view = ChannelManagementView()
         self.exchange_view = ExchangeManagementView()
 
-    def get(self, request):
-        context = {}
-        
-        # Get channels
+    @staticmethod
+    def _fetch_section(call):
+        start = time.perf_counter()
         try:
-            channels = self.channel_view.classifier_api.get_all_channels()
+            result, status = call(), 'ok'
         except Exception:
-            channels = []
-        
-        # Get exchanges
-        try:
-            exchanges = self.exchange_view.classifier_api.get_all_exchanges()
-        except Exception:
-            exchanges = []
-        
-        # Get latest tokens
-        try:
-            latest_tokens = self.channel_view.classifier_api.get_latest_tokens(limit=10)
-        except Exception:
-            latest_tokens = []
-        
-        context.update({
-            'channels': channels,
-            'exchanges': exchanges,
-            'latest_tokens': latest_tokens
-        })
-        
-        return render(request, 'dashboard/dashboard.html', context)
+            result, status = [], 'error'
+        return result, status, (time.perf_counter() - start) * 1000
+
+    def _fetch_sections(self):
+        """
+        Run the page's upstream calls in parallel, each with a deadline. A
+        slow or failing section renders empty instead of holding up the
+        whole page; a call past its deadline finishes in the background.
+        """
+        classifier_api = self.channel_view.classifier_api
+        calls = {
+            'channels': classifier_api.get_all_channels,
+            'exchanges': classifier_api.get_all_exchanges,
+            'latest_tokens': lambda: classifier_api.get_latest_tokens(limit=10),
+        }
+        start = time.perf_counter()
+        futures = {name: _section_executor.submit(self._fetch_section, call) for name, call in calls.items()}
+        wait(futures.values(), timeout=settings.DASHBOARD_SECTION_TIMEOUT)
+
+        sections = []
+        for name, future in futures.items():
+            if future.done():
+                sections.append((name, *future.result()))
+            else:
+                sections.append((name, [], 'timeout', (time.perf_counter() - start) * 1000))
+        return sections
+
+    def get(self, request):
+        context = {}
+
+        # Channels, exchanges and latest tokens are fetched concurrently
+        sections = self._fetch_sections()
+        for name, result, status, duration_ms in sections:
+            context[name] = result
+            if status != 'ok':
+                logger.warning(f"Dashboard section {name} unavailable ({status}) after {duration_ms:.1f}ms")
+        logger.info("Dashboard sections: " + ", ".join(
+            f"{name}={duration_ms:.1f}ms ({status})" for name, _, status, duration_ms in sections
+        ))
+
+        response = render(request, 'dashboard/dashboard.html', context)
+        response['Server-Timing'] = ", ".join(
+            f'{name};desc="{status}";dur={duration_ms:.1f}' for name, _, status, duration_ms in sections
+        )
+        return response
 
     def post(self, request):
         action = request.POST.get('action')
@@ -118,3 +162,24 @@ def get_channels(request):
                           context,
                           request=request)
     return HttpResponse(html)
+
+def _metrics_allowed(request):
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in network for network in _metrics_networks)
+
+
+def metrics(request):
+    """
+    Prometheus text exposition of the metrics of every worker (see metrics.py),
+    for allowed clients only (METRICS_ALLOWED_IPS, METRICS_TOKEN).
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(process_metrics.render_all(), content_type=process_metrics.CONTENT_TYPE)
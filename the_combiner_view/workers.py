@@ -0,0 +1,163 @@
+"""
+Run several Daphne worker processes behind one port.
+
+The supervisor binds the listening socket once and hands it to every worker
+with ``daphne --fd``; the kernel spreads incoming connections across them.
+Workers that exit are restarted, SIGTERM/SIGINT stop all of them. A worker
+that keeps exiting soon after it started is restarted with exponential
+backoff, and after CRASH_LOOP_LIMIT such exits in a row the supervisor stops
+every worker and exits with status 1 (e.g. a broken configuration).
+
+Group sends (trade notifications, token broadcasts, connection status) only
+reach sockets in other workers through a shared channel layer, so more than
+one worker requires REDIS_URL (see CHANNEL_LAYERS in settings.py).
+
+Usage:
+    python -m the_combiner_view.workers --workers 4 --port 7999
+
+Configuration (environment variables, overridden by the flags):
+- DAPHNE_WORKERS: number of worker processes (default 1)
+- DAPHNE_BIND / DAPHNE_PORT: listening address (default 0.0.0.0 / 7999)
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ASGI_APPLICATION = "the_combiner_view.asgi:application"
+
+# How often the supervisor checks on its workers, in seconds
+POLL_INTERVAL = 1.0
+
+# A worker exiting within CRASH_WINDOW seconds of its start counts towards a
+# crash loop; the n-th such exit in a row delays the restart by
+# RESTART_BACKOFF * 2 ** (n - 1) seconds, capped at MAX_RESTART_BACKOFF
+CRASH_WINDOW = 10.0
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 30.0
+
+# Quick exits in a row after which the supervisor gives up
+CRASH_LOOP_LIMIT = 5
+
+
+def _channel_layer_is_local() -> bool:
+    # Only load settings, starting Django here would start the ingest
+    # services in the supervisor as well
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "the_combiner_view.settings")
+    from channels.layers import InMemoryChannelLayer
+    from django.conf import settings
+    from django.utils.module_loading import import_string
+    return issubclass(import_string(settings.CHANNEL_LAYERS["default"]["BACKEND"]), InMemoryChannelLayer)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host.strip("[]"), port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, workers: int, daphne_args: List[str]):
+        self.sock = sock
+        self.workers = workers
+        self.daphne_args = daphne_args
+        self.processes: Dict[int, subprocess.Popen] = {}
+        self.stopping = False
+        self.exit_code = 0
+        self._started: Dict[int, float] = {}
+        self._quick_exits: Dict[int, int] = {}
+        # slot -> monotonic time of its delayed restart
+        self._restart_at: Dict[int, float] = {}
+
+    def _spawn(self, slot: int) -> None:
+        fd = self.sock.fileno()
+        env = dict(os.environ, DAPHNE_WORKER_ID=str(slot), DAPHNE_WORKERS=str(self.workers))
+        command = [sys.executable, "-m", "daphne", "--fd", str(fd), *self.daphne_args, ASGI_APPLICATION]
+        self.processes[slot] = subprocess.Popen(command, pass_fds=(fd,), env=env)
+        self._started[slot] = time.monotonic()
+        print(f"Started worker {slot} (pid {self.processes[slot].pid})", flush=True)
+
+    def _exited(self, slot: int, process: subprocess.Popen, code: int) -> None:
+        now = time.monotonic()
+        if now - self._started[slot] < CRASH_WINDOW:
+            self._quick_exits[slot] = self._quick_exits.get(slot, 0) + 1
+        else:
+            self._quick_exits[slot] = 0
+        quick_exits = self._quick_exits[slot]
+        if quick_exits >= CRASH_LOOP_LIMIT:
+            print(f"Worker {slot} (pid {process.pid}) exited with {code}, {quick_exits} times in a row "
+                  f"within {CRASH_WINDOW:g} s of starting; giving up", flush=True)
+            self.stopping = True
+            self.exit_code = 1
+            return
+        if not quick_exits:
+            print(f"Worker {slot} (pid {process.pid}) exited with {code}, restarting", flush=True)
+            self._spawn(slot)
+            return
+        delay = min(RESTART_BACKOFF * 2 ** (quick_exits - 1), MAX_RESTART_BACKOFF)
+        print(f"Worker {slot} (pid {process.pid}) exited with {code}, restarting in {delay:g} s", flush=True)
+        self._restart_at[slot] = now + delay
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self.stopping:
+            time.sleep(POLL_INTERVAL)
+            for slot, process in list(self.processes.items()):
+                if self.stopping:
+                    break
+                if slot in self._restart_at:
+                    if time.monotonic() >= self._restart_at[slot]:
+                        del self._restart_at[slot]
+                        self._spawn(slot)
+                    continue
+                code = process.poll()
+                if code is not None:
+                    self._exited(slot, process, code)
+
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        return self.exit_code
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run several Daphne workers sharing one listening socket")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("DAPHNE_WORKERS", "1")))
+    parser.add_argument("--bind", default=os.getenv("DAPHNE_BIND", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("DAPHNE_PORT", "7999")))
+    args, daphne_args = parser.parse_known_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and _channel_layer_is_local():
+        parser.error("more than one worker needs a shared channel layer, set REDIS_URL")
+
+    sock = _bind(args.bind, args.port)
+    print(f"Listening on {args.bind}:{args.port} with {args.workers} worker(s)", flush=True)
+    return Supervisor(sock, args.workers, daphne_args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
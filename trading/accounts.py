@@ -0,0 +1,237 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from the_combiner_view.api_utils import TradeExternalApis
+from the_combiner_view.async_api_utils import AsyncTradeExternalApis
+from the_combiner_view.circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class AccountMetadataCache:
+    """
+    TTL + LRU cache of trading-account metadata (exchange, name, ...) keyed by
+    account id, used on the order path so dispatch does not wait on
+    get_trading_account.
+
+    A background thread (started by the ingest leader, see start()) pre-populates
+    the accounts referenced by enabled automation rules and refreshes every
+    cached entry well before its TTL runs out, so lookups are normally served
+    from memory. Only a cold miss (an account never seen before) goes to the
+    trading API inline. An expired entry is still returned while it reloads,
+    in the background where the refresher runs, inline elsewhere with the
+    old entry as the fallback if the reload fails.
+    """
+    def __init__(self, fetch: Callable[[int], Dict[str, Any]], ttl: float = 300,
+                 maxsize: int = 1024, refresh_interval: float = 60):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.refresh_interval = refresh_interval
+
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: "queue.Queue[int]" = queue.Queue()
+        self._queued = set()
+        self._thread: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, account_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            account_info = self.fetch(account_id)
+        except Exception as e:
+            logger.warning(f"Could not fetch account {account_id}: {e}")
+            return None
+        if not isinstance(account_info, dict) or not account_info.get('id'):
+            logger.warning(f"Unexpected account info for {account_id}: {account_info}")
+            return None
+        self.put(account_id, account_info)
+        return account_info
+
+    def put(self, account_id: int, account_info: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[account_id] = (time.monotonic(), account_info)
+            self._entries.move_to_end(account_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, account_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Return account metadata, fetching inline only on a cold entry (or an
+        expired one when no refresher runs in this process).
+        """
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is not None:
+                self._entries.move_to_end(account_id)
+                if time.monotonic() - entry[0] < self.ttl:
+                    self.hits += 1
+                    return entry[1]
+            self.misses += 1
+        if entry is not None and self._thread is not None:
+            self._schedule(account_id)
+            return entry[1]
+        account_info = self._load(account_id)
+        if account_info is None and entry is not None:
+            return entry[1]
+        return account_info
+
+    def invalidate(self, account_id: int) -> None:
+        with self._lock:
+            self._entries.pop(account_id, None)
+
+    def _schedule(self, account_id: int) -> None:
+        with self._lock:
+            if account_id in self._queued:
+                return
+            self._queued.add(account_id)
+        self._pending.put(account_id)
+
+    def prefetch(self, account_ids: Iterable[Any]) -> None:
+        """
+        Queue accounts for a background (re)load, without waiting for it.
+        Does nothing in processes where the refresher is not running.
+        """
+        if self._thread is None:
+            return
+        for account_id in account_ids:
+            try:
+                self._schedule(int(account_id))
+            except (TypeError, ValueError):
+                logger.warning(f"Skipping invalid account ID: {account_id}")
+
+    def _rule_account_ids(self) -> Iterable[Any]:
+        from .rule_index import rule_index
+        return rule_index.account_ids()
+
+    def _refresh_all(self) -> None:
+        with self._lock:
+            account_ids = set(self._entries)
+        try:
+            account_ids.update(int(a) for a in self._rule_account_ids() if str(a).isdigit())
+        except Exception as e:
+            logger.warning(f"Could not list automation rule accounts: {e}")
+        for account_id in account_ids:
+            self._load(account_id)
+
+    def _refresh_loop(self) -> None:
+        self._refresh_all()
+        next_refresh = time.monotonic() + self.refresh_interval
+        while True:
+            try:
+                account_id = self._pending.get(timeout=max(0.0, next_refresh - time.monotonic()))
+            except queue.Empty:
+                self._refresh_all()
+                next_refresh = time.monotonic() + self.refresh_interval
+            else:
+                with self._lock:
+                    self._queued.discard(account_id)
+                self._load(account_id)
+
+    def start(self) -> None:
+        """
+        Pre-populate from enabled rules and keep entries fresh in the background.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="account-cache", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+account_cache = AccountMetadataCache(
+    TradeExternalApis().get_trading_account,
+    ttl=settings.ACCOUNT_CACHE_TTL,
+    maxsize=settings.ACCOUNT_CACHE_SIZE,
+    refresh_interval=settings.ACCOUNT_CACHE_REFRESH_INTERVAL,
+)
+
+
+def _user_accounts_key(username: str) -> str:
+    return f"trading:user_accounts:{username}"
+
+
+def _stale_user_accounts_key(username: str) -> str:
+    return f"trading:user_accounts:stale:{username}"
+
+
+def get_user_accounts(username: str) -> Dict[str, Any]:
+    """
+    get_user_accounts response for a user, cached in Django's cache for
+    USER_ACCOUNTS_CACHE_TTL seconds. Only successful responses are cached.
+    While the trading API's circuit breaker is open the last known list is
+    returned instead of failing.
+    """
+    key = _user_accounts_key(username)
+    user_data = cache.get(key)
+    if user_data is None:
+        try:
+            user_data = TradeExternalApis().get_user_accounts(username)
+        except CircuitOpenError:
+            user_data = cache.get(_stale_user_accounts_key(username))
+            if user_data is None:
+                raise
+            return user_data
+        if _is_success(user_data):
+            cache.set(key, user_data, settings.USER_ACCOUNTS_CACHE_TTL)
+            cache.set(_stale_user_accounts_key(username), user_data, settings.UPSTREAM_STALE_TTL)
+    return user_data
+
+
+async def aget_user_accounts(username: str) -> Dict[str, Any]:
+    """
+    get_user_accounts for code on an event loop: the same cache entries, read
+    with the async client on the running loop instead of a worker thread.
+    """
+    key = _user_accounts_key(username)
+    user_data = await cache.aget(key)
+    if user_data is None:
+        try:
+            user_data = await AsyncTradeExternalApis().get_user_accounts(username)
+        except CircuitOpenError:
+            user_data = await cache.aget(_stale_user_accounts_key(username))
+            if user_data is None:
+                raise
+            return user_data
+        if _is_success(user_data):
+            await cache.aset(key, user_data, settings.USER_ACCOUNTS_CACHE_TTL)
+            await cache.aset(_stale_user_accounts_key(username), user_data, settings.UPSTREAM_STALE_TTL)
+    return user_data
+
+
+def _is_success(user_data: Any) -> bool:
+    return isinstance(user_data, dict) and user_data.get('status') == 'success'
+
+
+def _account_ids(user_data: Any) -> List[str]:
+    if _is_success(user_data):
+        return [str(account['id']) for account in user_data.get('accounts', [])]
+    return []
+
+
+def get_user_account_ids(username: str) -> List[str]:
+    """
+    Ids of the user's trading accounts, as strings, for authorizing rule access.
+    """
+    return _account_ids(get_user_accounts(username))
+
+
+async def aget_user_account_ids(username: str) -> List[str]:
+    return _account_ids(await aget_user_accounts(username))
+
+
+def invalidate_user_accounts(username: str) -> None:
+    cache.delete(_user_accounts_key(username))
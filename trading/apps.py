@@ -6,5 +6,6 @@ class TradingConfig(AppConfig):
     name = 'trading'
 
     def ready(self):
-        from .external_service import ExternalWebSocketService
-        ExternalWebSocketService.get_instance()
+        from . import signals  # noqa: F401  keeps the automation rule index current
+        from . import metrics  # noqa: F401  registers the /metrics collector
+        # Background services start from asgi.py, see startup.py
@@ -1,6 +1,11 @@
 import logging
-from typing import List, Dict, Any
-from .models import AutomationRule
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple, Union
+from django.conf import settings
+from . import frames, groups, latency, metrics
+from .accounts import account_cache
+from .messages import TokenSignal, parse_message
+from .rule_index import CompiledRule, rule_index
 from the_combiner_view.api_utils import TradeExternalApis
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -9,257 +14,303 @@ import time
 logger = logging.getLogger(__name__)
 trade_api = TradeExternalApis()
 
+# Bounded pool shared by account lookups and orders in concurrent dispatch mode
+_order_executor = ThreadPoolExecutor(
+    max_workers=settings.AUTOMATION_MAX_CONCURRENT_ORDERS,
+    thread_name_prefix="automation-order"
+)
+
+
+class PendingOrder(NamedTuple):
+    rule_id: int
+    account_id: int
+    token: Dict[str, Any]
+    order_data: Dict[str, Any]
+    trace: Optional[latency.Trace] = None
+
+
+# Order results, also the outcome label of metrics.orders
+ACKED = 'acked'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+# Order statuses of the MEXC API for orders that will never fill
+_REJECTED_STATUSES = {'REJECTED', 'EXPIRED', 'CANCELED', 'CANCELLED'}
+
+# (order, result, response), response is None when the order failed
+OrderOutcome = Tuple[PendingOrder, str, Optional[Dict[str, Any]]]
+
+
+def order_result(response: Any) -> str:
+    """
+    ACKED or REJECTED for a response of create_mexc_order: error status
+    codes, MEXC error bodies ({"code": ..., "msg": ...}), error details and
+    dead order statuses are rejections.
+    """
+    if not isinstance(response, dict):
+        return REJECTED
+    status_code = (response.get('_metadata') or {}).get('status_code')
+    if status_code is not None and not 200 <= status_code < 300:
+        return REJECTED
+    if response.get('error') or response.get('detail'):
+        return REJECTED
+    if response.get('code') not in (None, 0, 200, '0', '200'):
+        return REJECTED
+    if str(response.get('status', '')).upper() in _REJECTED_STATUSES:
+        return REJECTED
+    return ACKED
+
+
 class AutomationHandler:
+    """
+    Runs automation for token signals on the automation workers.
+
+    The normal path logs one INFO record per signal (see _log_signal), with
+    the orders it placed as structured fields. Per-rule and per-order detail
+    is DEBUG, sampled by LOG_DEBUG_SAMPLE_EVERY; failures are always logged.
+    """
     @staticmethod
-    def _normalize_exchange_name(exchange: str) -> str:
+    def _prepare_orders(rule: CompiledRule, matching_tokens: List[Dict[str, Any]],
+                        trace: Optional[latency.Trace] = None) -> List[PendingOrder]:
         """
-        Normalize exchange names for comparison by removing spaces and special characters
-        and converting to lowercase
+        Resolve the rule's account and build one market order per matching token.
+        Limited to maximum 2 tokens, the rule amount is split evenly between them.
         """
-        return ''.join(e for e in exchange.lower() if e.isalnum())
+        # If more than 2 tokens, take only the first 2
+        if len(matching_tokens) > 2:
+            logger.debug("Rule %s: limiting to the first 2 of %s tokens", rule.id, len(matching_tokens))
+            matching_tokens = matching_tokens[:2]
+
+        try:
+            account_id = int(rule.account)
+        except ValueError:
+            logger.error(f"Invalid account ID format: {rule.account}")
+            return []
+
+        account_info = account_cache.get(account_id)
+        if not account_info:
+            logger.warning(f"Rule {rule.id}: could not fetch account info for ID {account_id}")
+            return []
+        if trace is not None:
+            trace = trace.fork()
+            trace.mark(latency.ACCOUNT_RESOLVED)
+
+        if account_info['exchange'].lower() != 'mexc':
+            logger.warning(f"Rule {rule.id}: unsupported exchange {account_info['exchange']}")
+            return []
+
+        # Calculate USDT amount per token
+        usdt_per_token = rule.amount_usdt / len(matching_tokens)
+        logger.debug("Rule %s: %s USDT per token on account %s", rule.id, usdt_per_token, account_id)
+
+        return [
+            PendingOrder(
+                rule_id=rule.id,
+                account_id=account_id,
+                token=token,
+                order_data={
+                    "symbol": f"{token.get('token')}USDT",
+                    "side": "BUY",
+                    "type": "MARKET",
+                    "quote_order_qty": usdt_per_token
+                },
+                trace=trace.fork() if trace is not None else None
+            )
+            for token in matching_tokens
+        ]
 
     @staticmethod
-    def _exchanges_match(rule_exchanges: List[str], token_exchange: str) -> bool:
+    def _send_order(order: PendingOrder) -> OrderOutcome:
         """
-        Check if token exchange matches any of the rule exchanges using normalized names
+        Send a single MEXC market order. Retries run inside create_mexc_order,
+        so each order retries independently of the others.
         """
-        if not token_exchange:
-            return False
-            
-        normalized_token_exchange = AutomationHandler._normalize_exchange_name(token_exchange)
-        
-        print(f"      Comparing exchanges:")
-        print(f"      - Token exchange: {token_exchange} -> {normalized_token_exchange}")
-        print(f"      - Rule exchanges: {rule_exchanges}")
-        
-        for rule_exchange in rule_exchanges:
-            normalized_rule = AutomationHandler._normalize_exchange_name(rule_exchange)
-            print(f"      - Comparing with: {rule_exchange} -> {normalized_rule}")
-            
-            # Basic match
-            if normalized_rule == normalized_token_exchange:
-                print(f"      ✓ Exact match")
-                return True
-                
-            # Coinbase special handling
-            if 'coinbase' in normalized_token_exchange and 'coinbase' in normalized_rule:
-                print(f"      ✓ Coinbase match")
-                return True
-                
-        print(f"      × No match found")
-        return False
+        logger.debug("Sending order on account %s: %s", order.account_id, order.order_data)
+        latency.mark(order.trace, latency.ORDER_SENT)
+        try:
+            response = trade_api.create_mexc_order(order.account_id, order.order_data)
+        except Exception:
+            metrics.orders.inc(FAILED)
+            raise
+        result = order_result(response)
+        metrics.orders.inc(result)
+        if result == ACKED:
+            latency.mark(order.trace, latency.ORDER_ACKED)
+            logger.debug("Response for %s on account %s: %s", order.order_data['symbol'], order.account_id, response)
+        else:
+            logger.warning(f"Order {order.order_data['symbol']} on account {order.account_id} "
+                           f"rejected for rule {order.rule_id}: {response}")
+        return order, result, response
 
     @staticmethod
-    def _execute_trade(account_id: int, token: str, amount: float, account_info: Dict[str, Any]) -> None:
+    def _notify_trade(account_id: int, response: Dict[str, Any], trace: Optional[latency.Trace] = None) -> None:
         """
-        Execute trade for a single token
+        Send an order response to the clients of the account's owner only,
+        with the order's stage timings under ``_metadata``. A failed send is
+        logged, the order is placed either way.
         """
+        metadata = trace.metadata() if trace is not None else None
         try:
-            symbol = f"{token}USDT"
-            print(f"\n      Executing trade for {symbol}")
-            print(f"      Account: {account_info['name']} ({account_info['exchange']})")
-            print(f"      Amount: {amount} USDT")
-
-            order_data = {
-                "symbol": symbol,
-                "side": "BUY",
-                "type": "MARKET",
-                "quote_order_qty": amount
-            }
-
-            if account_info['exchange'].lower() == 'mexc':
-                print(f"      Sending MEXC market order: {order_data}")
-                response = trade_api.create_mexc_order(account_id, order_data)
-                print(f"      MEXC Order Response: {response}")
-                
-                # Emit WebSocket message for trade notification
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    "trading",
-                    {
-                        "type": "trade_notification",
-                        "message": {
-                            "type": "mexc_trade",
-                            "data": response
-                        }
-                    }
-                )
-            else:
-                print(f"      Unsupported exchange: {account_info['exchange']}")
-
+            channel_layer = get_channel_layer()
+            async_to_sync(channel_layer.group_send)(
+                groups.account_group(account_id),
+                {
+                    "type": "trade_notification",
+                    "text": frames.trade_notification(response, metadata)
+                }
+            )
         except Exception as e:
-            print(f"      Error executing trade: {str(e)}")
-            logger.error(f"Trade execution error: {str(e)}", exc_info=True)
+            logger.error(f"Could not send a trade notification to account {account_id}: {e}", exc_info=True)
+            return
+        latency.mark(trace, latency.BROADCAST_SENT)
 
     @staticmethod
-    def _evaluate_rule(rule: AutomationRule, tokens_data: List[Dict[str, Any]]) -> None:
+    def _handle_matching_tokens(rule: CompiledRule, matching_tokens: List[Dict[str, Any]],
+                                trace: Optional[latency.Trace] = None) -> List[OrderOutcome]:
         """
-        Evaluate a single rule against token data.
+        Handle tokens that match rule criteria. Limited to maximum 2 tokens.
+        Execute trades through the appropriate exchange API, one after another.
         """
+        outcomes: List[OrderOutcome] = []
         try:
-            print("\n  Evaluating Rule Criteria")
-            
-            token_market = tokens_data[0].get('market', '').lower()
-            print(f"  Token market: {token_market}, Rule market: {rule.market_type}")
-            
-            if rule.market_type != 'both' and rule.market_type != token_market:
-                print("  Market type mismatch - skipping rule")
-                return
+            trades = AutomationHandler._prepare_orders(rule, matching_tokens, trace)
 
-            # Check if any token matches rule exchanges
-            matching_tokens = [
-                token for token in tokens_data
-                if AutomationHandler._exchanges_match(rule.exchanges, token.get('exchange', ''))
-            ]
+            # Execute trades with minimal delay
+            for index, order in enumerate(trades, 1):
+                try:
+                    outcomes.append(AutomationHandler._send_order(order))
+                except Exception as e:
+                    logger.error(f"Error sending order {order.order_data} for rule {rule.id}: {e}", exc_info=True)
+                    outcomes.append((order, FAILED, None))
+                if index < len(trades):
+                    time.sleep(0.002)  # 2ms delay between trades
 
-            if matching_tokens:
-                print(f"  Found {len(matching_tokens)} matching tokens")
-                print(f"  Matching tokens: {matching_tokens}")
-                AutomationHandler._handle_matching_tokens(rule, matching_tokens)
-            else:
-                print("  No matching tokens found for this rule")
+            # Send notifications, rejections included
+            for order, _, response in outcomes:
+                if response is not None:
+                    AutomationHandler._notify_trade(order.account_id, response, order.trace)
 
         except Exception as e:
-            print(f"Error in _evaluate_rule: {str(e)}")
-            logger.error(f"Error evaluating rule {rule.id}: {e}", exc_info=True)
+            logger.error(f"Error handling matching tokens for rule {rule.id}: {e}", exc_info=True)
+        return outcomes
 
     @staticmethod
-    def _handle_matching_tokens(rule: AutomationRule, matching_tokens: List[Dict[str, Any]]) -> None:
+    def _dispatch_concurrently(matches: List[Tuple[CompiledRule, List[Dict[str, Any]]]],
+                               trace: Optional[latency.Trace] = None) -> List[OrderOutcome]:
         """
-        Handle tokens that match rule criteria. Limited to maximum 2 tokens.
-        Execute trades through the appropriate exchange API.
+        Send every order for a signal, across all matching rules, at once.
+        Account lookups and orders share a bounded pool of order threads; each
+        rule's orders are submitted as soon as its account is resolved, and
+        notifications go out as responses come back.
         """
-        try:
-            print("\n    Processing Matching Tokens")
-            print(f"    Total matching tokens: {len(matching_tokens)}")
-            
-            # If more than 2 tokens, take only the first 2
-            if len(matching_tokens) > 2:
-                print(f"    Limiting to first 2 tokens (from {len(matching_tokens)} total)")
-                matching_tokens = matching_tokens[:2]
-
-            # Get account information
+        prepare_futures = {
+            _order_executor.submit(AutomationHandler._prepare_orders, rule, tokens, trace): rule
+            for rule, tokens in matches
+        }
+
+        order_futures = {}
+        for future in as_completed(prepare_futures):
+            rule = prepare_futures[future]
             try:
-                account_id = int(rule.account)
-                account_info = trade_api.get_trading_account(account_id)
-                
-                if not account_info.get('id'):
-                    print(f"    Error: Could not fetch account info for ID {account_id}")
-                    return
-
-                print(f"    Account Info: {account_info}")
-                
-                # Calculate USDT amount per token
-                usdt_per_token = rule.amount_usdt / len(matching_tokens)
-                print(f"    USDT per token ({rule.amount_usdt} / {len(matching_tokens)}): {usdt_per_token}")
-                
-                # Prepare all trades first
-                trades = []
-                for token in matching_tokens:
-                    symbol = f"{token.get('token')}USDT"
-                    order_data = {
-                        "symbol": symbol,
-                        "side": "BUY",
-                        "type": "MARKET",
-                        "quote_order_qty": usdt_per_token
-                    }
-                    trades.append((token, order_data))
-
-                # Execute trades with minimal delay
-                responses = []
-                for index, (token, order_data) in enumerate(trades, 1):
-                    print(f"\n    Sending Trade {index}/{len(trades)}:")
-                    print(f"    - Token: {token.get('token')}")
-                    print(f"    - Amount: {usdt_per_token} USDT")
-
-                    if account_info['exchange'].lower() == 'mexc':
-                        # Send trade asynchronously
-                        response = trade_api.create_mexc_order(account_id, order_data)
-                        responses.append((token, response))
-                        if index < len(trades):
-                            time.sleep(0.002)  # 2ms delay between trades
-                    else:
-                        print(f"    Unsupported exchange: {account_info['exchange']}")
-
-                # Process responses and send notifications
-                for token, response in responses:
-                    print(f"\n    Processing response for {token.get('token')}:")
-                    print(f"    Response: {response}")
-                    
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        "trading",
-                        {
-                            "type": "trade_notification",
-                            "message": {
-                                "type": "mexc_trade",
-                                "data": response
-                            }
-                        }
-                    )
-
-            except ValueError as e:
-                print(f"    Error: Invalid account ID format: {rule.account}")
-                logger.error(f"Invalid account ID format: {rule.account}")
-                return
+                orders = future.result()
+            except Exception as e:
+                logger.error(f"Error preparing orders for rule {rule.id}: {e}", exc_info=True)
+                continue
+            for order in orders:
+                order_futures[_order_executor.submit(AutomationHandler._send_order, order)] = order
 
-        except Exception as e:
-            print(f"Error in _handle_matching_tokens: {str(e)}")
-            logger.error(f"Error handling matching tokens for rule {rule.id}: {e}", exc_info=True)
-        finally:
-            print("    Token Processing Complete")
+        outcomes: List[OrderOutcome] = []
+        for future in as_completed(order_futures):
+            order = order_futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                logger.error(f"Error sending order {order.order_data} for rule {order.rule_id}: {e}", exc_info=True)
+                outcomes.append((order, FAILED, None))
+                continue
+            outcomes.append(outcome)
+            AutomationHandler._notify_trade(order.account_id, outcome[2], order.trace)
+        return outcomes
 
     @staticmethod
-    def process_message(message: Dict[str, Any]) -> None:
+    def process_message(message: Union[TokenSignal, Dict[str, Any], str, bytes]) -> None:
         """
         Process incoming websocket message and trigger automation rules if applicable.
+        The ingest path hands over an already parsed TokenSignal; raw frames and
+        plain dicts are parsed here for other callers.
         """
         try:
-            print("\n=== Starting Message Processing ===")
-            print(f"Received message: {message}")
-
-            if not isinstance(message, dict):
-                print("Converting string message to dict...")
-                message = eval(message)
-                
-            if message.get('type') != 'tokens':
-                print(f"Skipping message of type: {message.get('type')} (not 'tokens')")
+            if isinstance(message, (str, bytes)):
+                message = parse_message(message)
+            elif not isinstance(message, TokenSignal):
+                message = TokenSignal.from_payload(message)
+
+            if not message.is_tokens:
+                logger.debug("Skipping message of type %s", message.type)
                 return
 
-            tokens_data = message.get('data', [])
+            tokens_data = list(message.data)
             if not tokens_data:
-                print("No token data found in message")
+                logger.debug("Tokens message without tokens")
                 return
 
-            print(f"Processing tokens data: {tokens_data}")
-            AutomationHandler._process_tokens(tokens_data)
+            AutomationHandler._process_tokens(tokens_data, message.trace)
 
         except Exception as e:
-            print(f"Error in process_message: {str(e)}")
             logger.error(f"Error processing automation message: {e}", exc_info=True)
-        finally:
-            print("=== Message Processing Complete ===\n")
 
     @staticmethod
-    def _process_tokens(tokens_data: List[Dict[str, Any]]) -> None:
+    def _process_tokens(tokens_data: List[Dict[str, Any]], trace: Optional[latency.Trace] = None) -> None:
         """
         Process tokens against active automation rules.
         """
+        started = time.monotonic()
+        matches = []
+        outcomes: List[OrderOutcome] = []
         try:
-            print("\n--- Starting Token Processing ---")
-            
-            active_rules = AutomationRule.objects.filter(status='enabled')
-            print(f"Found {active_rules.count()} active rules")
-            
-            for rule in active_rules:
-                print(f"\nEvaluating Rule ID: {rule.id}")
-                print(f"Rule details: Market Type: {rule.market_type}, "
-                      f"Exchanges: {rule.exchanges}, Amount: {rule.amount_usdt} USDT")
-                AutomationHandler._evaluate_rule(rule, tokens_data)
+            matches = rule_index.match(tokens_data)
+            latency.mark(trace, latency.MATCHED)
+            metrics.rule_evaluations.inc()
+            metrics.rule_matches.inc(amount=len(matches))
+            for rule, matching_tokens in matches:
+                logger.debug("Rule %s matched %s tokens (%s, %s, %s USDT)", rule.id, len(matching_tokens),
+                             rule.market_type, rule.exchanges, rule.amount_usdt)
+
+            if settings.AUTOMATION_ORDER_DISPATCH == 'concurrent':
+                outcomes = AutomationHandler._dispatch_concurrently(matches, trace)
+            else:
+                for rule, matching_tokens in matches:
+                    outcomes.extend(AutomationHandler._handle_matching_tokens(rule, matching_tokens, trace))
 
         except Exception as e:
-            print(f"Error in _process_tokens: {str(e)}")
             logger.error(f"Error processing tokens for automation: {e}", exc_info=True)
         finally:
-            print("--- Token Processing Complete ---\n")
-  
\ No newline at end of file
+            AutomationHandler._log_signal(tokens_data, len(matches), outcomes, started)
+
+    @staticmethod
+    def _log_signal(tokens_data: List[Dict[str, Any]], matched: int, outcomes: List[OrderOutcome],
+                    started: float) -> None:
+        """
+        The one INFO record of a signal: what came in and which orders went out.
+        """
+        results = [result for _, result, _ in outcomes]
+        elapsed_ms = (time.monotonic() - started) * 1000
+        logger.info(
+            f"Signal with {len(tokens_data)} tokens: {matched}/{len(rule_index)} rules matched, "
+            f"{results.count(ACKED)} orders acked, {results.count(REJECTED)} rejected, "
+            f"{results.count(FAILED)} failed in {elapsed_ms:.1f} ms",
+            extra={
+                'tokens': [f"{token.get('token')}@{token.get('exchange')}" for token in tokens_data],
+                'orders': [
+                    {
+                        'rule': order.rule_id,
+                        'account': order.account_id,
+                        'symbol': order.order_data['symbol'],
+                        'quote_order_qty': order.order_data['quote_order_qty'],
+                        'outcome': result,
+                    }
+                    for order, result, _ in outcomes
+                ],
+                'elapsed_ms': round(elapsed_ms, 3),
+            },
+        )
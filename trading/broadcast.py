@@ -0,0 +1,199 @@
+"""
+Coalescing, rate-limited broadcast to the dashboard sockets.
+
+Two stages sit between the upstream reader and the websockets:
+
+- FrameBatcher, on the ingest leader: the first upstream frame after a quiet
+  period is broadcast at once; frames arriving during the following
+  BROADCAST_WINDOW_MS are broadcast together as one JSON array frame at the
+  end of the window. A listing burst becomes a few group sends instead of
+  one per frame, which keeps channel layer queues below capacity. Frames
+  that are not JSON objects (frames.is_mergeable) are broadcast on their own
+  as "raw" events, right after the frames batched before them.
+- ClientOutbox, in every TradingConsumer: events are taken off the channel
+  layer immediately into a bounded outbox and written to the socket at most
+  once per window, merged into one frame (raw frames are written
+  separately, in order). Only the newest pending
+  connection_status is kept; when the outbox holds
+  BROADCAST_CLIENT_MAX_FRAMES frames the oldest token frames are dropped.
+  Trade notifications are never dropped. Daphne gives applications no view
+  of a socket's write buffer, so this caps what each socket is handed per
+  window rather than reacting to the socket itself.
+
+Merging only splices already encoded frames (frames.merge), nothing is
+decoded again. Counters are per process, see stats().
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from . import frames
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastStats:
+    def __init__(self):
+        self.upstream_frames = 0
+        self.broadcast_events = 0
+        self.batched_frames = 0
+        self.largest_batch = 0
+        self.client_events = 0
+        self.client_writes = 0
+        self.client_dropped = 0
+        self.status_collapsed = 0
+        self.open_outboxes = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+_stats = BroadcastStats()
+
+
+def stats() -> Dict[str, Any]:
+    return _stats.as_dict()
+
+
+class FrameBatcher:
+    """
+    Leading-edge micro-batcher: ``send(text, raw)`` is awaited with a single
+    frame or an array frame, at most once per ``window`` seconds while frames
+    keep arriving, and with ``raw=True`` for every frame published as not
+    mergeable.
+    """
+    def __init__(self, send: Callable[[str, bool], Awaitable[None]], window: float):
+        self.send = send
+        self.window = window
+        self._pending: List[str] = []
+        self._window_open = False
+
+    async def publish(self, text: str, mergeable: bool = True) -> None:
+        _stats.upstream_frames += 1
+        if not mergeable:
+            await self.flush()
+            await self._send([text], raw=True)
+            return
+        if self._window_open:
+            self._pending.append(text)
+            return
+        if self.window > 0:
+            self._window_open = True
+            asyncio.get_running_loop().create_task(self._run_window())
+        await self._send([text])
+
+    async def flush(self) -> None:
+        """
+        Send the frames waiting for the current window now.
+        """
+        if self._pending:
+            batch, self._pending = self._pending, []
+            await self._send(batch)
+
+    async def _run_window(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                if not self._pending:
+                    return
+                await self.flush()
+        finally:
+            self._window_open = False
+
+    async def _send(self, batch: List[str], raw: bool = False) -> None:
+        _stats.broadcast_events += 1
+        if len(batch) > 1:
+            _stats.batched_frames += len(batch)
+            _stats.largest_batch = max(_stats.largest_batch, len(batch))
+        try:
+            await self.send(frames.merge(batch), raw)
+        except Exception as e:
+            logger.error(f"Broadcast of {len(batch)} frames failed: {e}", exc_info=True)
+
+
+class ClientOutbox:
+    """
+    Per-socket outbox drained by one writer task. Frames are JSON text by
+    default; a binary socket passes ``frames.merge_packed`` as ``merge`` and
+    puts packed frames. Frames put with ``raw=True`` are written on their
+    own, never merged.
+    """
+    def __init__(self, write: Callable[[Any], Awaitable[None]], window: float, max_frames: int,
+                 merge: Callable[[List[Any]], Any] = frames.merge):
+        self.write = write
+        self.window = window
+        self.max_frames = max_frames
+        self.merge = merge
+        # (droppable, raw, frame) in arrival order
+        self._frames: Deque[Tuple[bool, bool, Any]] = deque()
+        self._status: Optional[Any] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        _stats.open_outboxes += 1
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def close(self) -> None:
+        if self._task is not None:
+            _stats.open_outboxes -= 1
+            self._task.cancel()
+            self._task = None
+
+    def put(self, frame: Any, droppable: bool = True, raw: bool = False) -> None:
+        _stats.client_events += 1
+        if len(self._frames) >= self.max_frames:
+            self._drop_oldest()
+        self._frames.append((droppable, raw, frame))
+        self._ready.set()
+
+    def put_status(self, frame: Any) -> None:
+        _stats.client_events += 1
+        if self._status is not None:
+            _stats.status_collapsed += 1
+        self._status = frame
+        self._ready.set()
+
+    def _drop_oldest(self) -> None:
+        for index, (droppable, _, _) in enumerate(self._frames):
+            if droppable:
+                del self._frames[index]
+                _stats.client_dropped += 1
+                return
+
+    def _writes(self, pending: List[Tuple[bool, Any]]) -> List[Any]:
+        # Runs of mergeable frames become one write each, raw frames their own
+        writes, run = [], []
+        for raw, frame in pending:
+            if raw:
+                if run:
+                    writes.append(self.merge(run))
+                    run = []
+                writes.append(frame)
+            else:
+                run.append(frame)
+        if run:
+            writes.append(self.merge(run))
+        return writes
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            pending = [(raw, frame) for _, raw, frame in self._frames]
+            self._frames.clear()
+            if self._status is not None:
+                pending.append((False, self._status))
+                self._status = None
+            if not pending:
+                continue
+            try:
+                for frame in self._writes(pending):
+                    _stats.client_writes += 1
+                    await self.write(frame)
+            except Exception as e:
+                logger.debug(f"Dropping {len(pending)} frames for a closed socket: {e}")
+            if self.window > 0:
+                await asyncio.sleep(self.window)
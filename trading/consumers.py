@@ -1,47 +1,144 @@
-import json
-from channels.generic.websocket import WebsocketConsumer
-from asgiref.sync import async_to_sync
+import logging
+
+from channels.consumer import get_handler_name
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from the_combiner_view.circuit_breaker import breaker_states
+from . import frames, groups, metrics
+from .accounts import aget_user_account_ids
+from .broadcast import ClientOutbox
 from .external_service import ExternalWebSocketService
 
-class TradingConsumer(WebsocketConsumer):
-    def connect(self):
-        self.accept()
-        # Add to the trading group
-        async_to_sync(self.channel_layer.group_add)(
-            "trading",
-            self.channel_name
+logger = logging.getLogger(__name__)
+
+class TradingConsumer(AsyncWebsocketConsumer):
+    """
+    Dashboard socket. Runs on the server's event loop, so an idle client
+    costs a coroutine rather than a thread. Group events arrive with their
+    frame already encoded (see frames.py) and are sent as is.
+
+    Events go through a per-socket outbox that merges them into at most one
+    write per BROADCAST_WINDOW_MS (see broadcast.py).
+
+    Clients offering the ``msgpack`` subprotocol receive binary msgpack
+    frames instead of JSON text, converted once per event (see frames.pack).
+
+    Every socket joins the broadcast group. Sockets of a logged-in user also
+    join that user's group and one group per trading account the user owns,
+    so trade notifications only reach the account's owner (see groups.py).
+    """
+    async def dispatch(self, message):
+        # Same as AsyncConsumer.dispatch minus close_old_connections(): no
+        # handler here touches the database, and that call is a thread hop
+        # for every frame sent to every socket
+        handler = getattr(self, get_handler_name(message), None)
+        if handler is None:
+            raise ValueError("No handler for message type %s" % message["type"])
+        await handler(message)
+
+    async def connect(self):
+        self.subscriptions = set()
+        self.binary = frames.MSGPACK_SUBPROTOCOL in self.scope.get("subprotocols", ())
+        if self.binary:
+            await self.accept(frames.MSGPACK_SUBPROTOCOL)
+        else:
+            await self.accept()
+        self.outbox = ClientOutbox(
+            self._write,
+            settings.BROADCAST_WINDOW_MS / 1000,
+            settings.BROADCAST_CLIENT_MAX_FRAMES,
+            merge=frames.merge_packed if self.binary else frames.merge,
         )
+        self.outbox.start()
+        metrics.websocket_connections.inc(self._protocol)
+        await self._join(groups.BROADCAST)
+
+        user = self.scope.get("user")
+        if user is not None and user.is_authenticated:
+            await self._join(groups.user_group(user.pk))
+            await self._sync_account_groups()
+
         # Send initial connection status
         service = ExternalWebSocketService.get_instance()
-        self.send(json.dumps({
-            'type': 'connection_status',
-            'is_external_connected': service.is_connected
-        }))
-
-    def disconnect(self, close_code):
-        # Remove from the trading group
-        async_to_sync(self.channel_layer.group_discard)(
-            "trading",
-            self.channel_name
-        )
+        self.outbox.put_status(self._frame(frames.connection_status(
+            await service.aconnection_status(),
+            breaker_states()
+        )))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "outbox"):
+            self.outbox.close()
+            metrics.websocket_connections.dec(self._protocol)
+        for group in list(getattr(self, "subscriptions", ())):
+            await self._leave(group)
+
+    @property
+    def _protocol(self):
+        return frames.MSGPACK_SUBPROTOCOL if self.binary else "json"
 
-    def broadcast_message(self, event):
-        # Forward the message to the WebSocket
-        self.send(text_data=event["message"])
+    def _frame(self, text):
+        if not self.binary:
+            return text
+        try:
+            return frames.pack(text)
+        except ValueError:
+            # Upstream frames that are not JSON go out as text, unchanged
+            return text
 
-    def connection_status(self, event):
-        # Forward connection status to the WebSocket
-        self.send(json.dumps({
-            'type': 'connection_status',
-            'is_external_connected': event["is_external_connected"]
-        }))
+    async def _write(self, frame):
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def _join(self, group):
+        await self.channel_layer.group_add(group, self.channel_name)
+        if group not in self.subscriptions:
+            metrics.group_joined(group)
+        self.subscriptions.add(group)
+
+    async def _leave(self, group):
+        await self.channel_layer.group_discard(group, self.channel_name)
+        if group in self.subscriptions:
+            metrics.group_left(group)
+        self.subscriptions.discard(group)
+
+    async def _sync_account_groups(self):
+        """
+        Make the socket's account groups match the user's trading accounts.
+        """
+        username = self.scope["user"].username
+        try:
+            # Cached in Django's cache; a miss is an HTTP call made with the
+            # async client on this loop, no worker thread involved
+            account_ids = await aget_user_account_ids(username)
+        except Exception as e:
+            logger.warning(f"Could not load trading accounts of {username}, no trade notifications: {e}")
+            return
+        wanted = {groups.account_group(account_id) for account_id in account_ids}
+        current = {group for group in self.subscriptions if groups.is_account_group(group)}
+        for group in wanted - current:
+            await self._join(group)
+        for group in current - wanted:
+            await self._leave(group)
+
+    async def broadcast_message(self, event):
+        # Forward the upstream frame to the WebSocket; raw frames (not JSON
+        # objects) are written on their own
+        self.outbox.put(self._frame(event["text"]), raw=event.get("raw", False))
+
+    async def connection_status(self, event):
+        # Only the newest pending status is sent
+        self.outbox.put_status(self._frame(event["text"]))
+
+    async def trade_notification(self, event):
+        """
+        Handler for trade notifications. Never dropped.
+        """
+        self.outbox.put(self._frame(event["text"]), droppable=False)
 
-    def trade_notification(self, event):
+    async def accounts_changed(self, event):
         """
-        Handler for trade notifications.
+        The user's trading accounts changed (e.g. one was verified).
         """
-        # Forward the message to WebSocket
-        self.send(text_data=json.dumps({
-            'type': event['message']['type'],
-            'data': event['message']['data']
-        })) 
\ No newline at end of file
+        await self._sync_account_groups()
@@ -1,24 +1,60 @@
-import json
-import websocket
+import asyncio
+import logging
+import os
+import random
+import socket
 import threading
-import time
-from typing import Optional, Callable
-from channels.layers import get_channel_layer
+from typing import Optional
+
+import websockets
 from asgiref.sync import async_to_sync
-import os
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from websockets.asyncio.client import connect
+
+from the_combiner_view import circuit_breaker
+from . import frames, groups, latency, metrics
+from .broadcast import FrameBatcher
+from .ingest import BLOCK, AutomationQueue
+from .messages import InvalidMessage, parse_message
+from .recording import FrameRecorder
+
+logger = logging.getLogger(__name__)
+
+# Connection status of the ingest leader, shared with the other workers
+STATUS_KEY = 'trading:ingest:status'
+
 class ExternalWebSocketService:
+    """
+    Upstream token feed reader. Only the ingest leader (see leader.py) starts
+    it; every other process reports the leader's status from the cache.
+
+    The reader is a coroutine on the server's event loop (Daphne's, see
+    startup.py): frames go straight to the channel layer without a thread
+    hop, and a dropped connection is retried at once with jittered
+    exponential backoff (INGEST_RECONNECT_BASE up to INGEST_RECONNECT_MAX
+    seconds) instead of on a polling interval.
+    """
     _instance = None
     
     def __init__(self):
-        self.external_ws = None
         self.is_connected = False
-        self.should_reconnect = True
+        self.is_running = False
         self.channel_layer = get_channel_layer()
-        
-        # Start single reconnection monitor thread
-        self.reconnect_thread = threading.Thread(target=self._reconnect_loop)
-        self.reconnect_thread.daemon = True
-        self.reconnect_thread.start()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lifecycle_lock = threading.Lock()
+
+        # Automation runs on its own worker pool so the socket reader never
+        # waits on rule matching or order calls
+        from .automation_handler import AutomationHandler
+        self.automation_queue = AutomationQueue.from_settings(AutomationHandler.process_message)
+        self.batcher = FrameBatcher(self._broadcast_frame, settings.BROADCAST_WINDOW_MS / 1000)
+        self.recorder = FrameRecorder(settings.INGEST_RECORD_PATH) if settings.INGEST_RECORD_PATH else None
+
+        # Let dashboards know when an upstream API starts failing fast
+        circuit_breaker.add_listener(lambda breaker: self.broadcast_connection_status())
 
     @classmethod
     def get_instance(cls):
@@ -26,77 +62,210 @@ class ExternalWebSocketService:
             cls._instance = cls()
         return cls._instance
 
-    def connect_to_external(self):
+    def use_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Run the reader on ``loop`` (the server's loop, which may not be running yet).
+        """
+        self.loop = loop
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # No server loop to share (e.g. not running under Daphne): use our own
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name="ingest-loop", daemon=True).start()
+        return self.loop
+
+    def start(self):
+        """
+        Start reading the upstream feed. Called when this process becomes the
+        ingest leader, from any thread.
+        """
+        with self._lifecycle_lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self.automation_queue.start()
+            loop = self._ensure_loop()
+            loop.call_soon_threadsafe(self._spawn)
+
+    def _spawn(self):
+        if not self.is_running:
+            return
+        # A reader still unwinding from stop() is replaced, not reused
+        if self._task is None or self._task.done() or self._task.cancelling():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """
+        Close the upstream feed. Called when this process loses the ingest
+        leadership, from any thread.
+        """
+        with self._lifecycle_lock:
+            if not self.is_running:
+                return
+            self.is_running = False
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self._cancel)
+            self.is_connected = False
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def connection_status(self):
+        """
+        Upstream connection status as seen by the ingest leader.
+        """
+        if self.is_running:
+            return self.is_connected
+        status = cache.get(STATUS_KEY)
+        return bool(status and status['is_external_connected'])
+
+    async def aconnection_status(self):
+        if self.is_running:
+            return self.is_connected
+        status = await cache.aget(STATUS_KEY)
+        return bool(status and status['is_external_connected'])
+
+    def _status_payload(self):
+        return {
+            'is_external_connected': self.is_connected,
+            'leader': f"{socket.gethostname()}:{os.getpid()}",
+        }
+
+    def publish_status(self):
+        if not self.is_running:
+            # A deposed leader must not overwrite its successor's status
+            return
+        cache.set(STATUS_KEY, self._status_payload(), settings.INGEST_LEADER_TTL + settings.INGEST_LEADER_INTERVAL)
+
+    async def _apublish_status(self):
+        if not self.is_running:
+            return
+        await cache.aset(STATUS_KEY, self._status_payload(), settings.INGEST_LEADER_TTL + settings.INGEST_LEADER_INTERVAL)
+
+    @staticmethod
+    def _external_ws_url():
         environment = os.getenv("ENVIRONMENT")
-        external_ws_url = os.getenv("DEV_EXTERNAL_WS_URL") if environment == "development" else os.getenv("EXTERNAL_WS_URL")
-        if self.external_ws:
-            try:
-                self.external_ws.close()
-            except:
-                pass
-        
+        return os.getenv("DEV_EXTERNAL_WS_URL") if environment == "development" else os.getenv("EXTERNAL_WS_URL")
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # Full jitter: workers restarted together do not reconnect in lockstep
+        ceiling = min(settings.INGEST_RECONNECT_MAX, settings.INGEST_RECONNECT_BASE * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def _run(self):
+        external_ws_url = self._external_ws_url()
+        if not external_ws_url:
+            logger.warning("EXTERNAL_WS_URL is not set, upstream ingest disabled")
+            return
+
+        attempt = 0
         try:
-            self.external_ws = websocket.WebSocketApp(
-                external_ws_url,
-                on_open=self.on_external_open,
-                on_close=self.on_external_close,
-                on_error=self.on_external_error,
-                on_message=self.on_external_message
-            )
-            # Start the external connection in a separate thread
-            self.ws_thread = threading.Thread(target=self.external_ws.run_forever)
-            self.ws_thread.daemon = True
-            self.ws_thread.start()
-        except Exception as e:
-            print(f"Failed to connect to external server: {e}")
-            self.is_connected = False
+            while self.is_running:
+                logger.info("Connecting to the upstream token feed")
+                try:
+                    async with connect(external_ws_url, max_size=None) as ws:
+                        attempt = 0
+                        await self._on_open()
+                        async for message in ws:
+                            await self._on_message(message)
+                    await self._on_close("closed by server")
+                except asyncio.CancelledError:
+                    raise
+                except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                    await self._on_close(e)
+                except Exception as e:
+                    logger.error(f"Upstream reader failed: {e}", exc_info=True)
+                    await self._on_close(e)
 
-    def _reconnect_loop(self):
-        while self.should_reconnect:
-            if not self.is_connected:
-                print("Attempting to reconnect to external server...")
-                self.connect_to_external()
-            time.sleep(5)  # Check connection status every 5 seconds
+                delay = self._backoff(attempt)
+                attempt += 1
+                if self.automation_queue.depth:
+                    logger.info(f"Automation queue: {self.automation_queue.stats()}")
+                await asyncio.sleep(delay)
+        finally:
+            # Deposed: the new leader reports the connection from now on
+            self.is_connected = False
+            if self.recorder is not None:
+                self.recorder.close()
 
-    def on_external_open(self, ws):
-        print("Connected to external server")
+    async def _on_open(self):
+        logger.info("Connected to the upstream token feed")
+        metrics.ingest_connections.inc()
         self.is_connected = True
-        self.broadcast_connection_status()
+        await self._apublish_status()
+        await self._abroadcast_connection_status()
 
-    def on_external_close(self, ws, close_status_code, close_msg):
-        print(f"External connection closed: {close_msg}")
+    async def _on_close(self, reason):
+        logger.warning(f"Upstream connection closed: {reason}")
+        metrics.ingest_disconnects.inc()
         self.is_connected = False
-        self.broadcast_connection_status()
+        await self._apublish_status()
+        await self._abroadcast_connection_status()
 
-    def on_external_error(self, ws, error):
-        print(f"External connection error: {error}")
-        self.is_connected = False
-        self.broadcast_connection_status()
+    async def _on_message(self, message):
+        trace = latency.Trace()
+        if self.recorder is not None:
+            self.recorder.record(message)
+        try:
+            # Sampled, see LOG_DEBUG_SAMPLE_EVERY; formatted only if kept
+            logger.debug("Upstream frame: %.200s", message)
+            text = message.decode('utf-8', errors='replace') if isinstance(message, bytes) else message
+            try:
+                signal = parse_message(message, trace=trace)
+            except InvalidMessage as e:
+                metrics.ingest_frames.inc('invalid')
+                logger.warning(f"Ignoring malformed upstream message for automation: {e}")
+            else:
+                metrics.ingest_frames.inc('tokens' if signal.is_tokens else 'other')
+                if signal.is_tokens:
+                    trace.mark(latency.PARSED)
+                    if self.automation_queue.overflow == BLOCK:
+                        # Wait for room without blocking the server loop; the
+                        # upstream socket is not read meanwhile
+                        await asyncio.get_running_loop().run_in_executor(None, self.automation_queue.put, signal)
+                    else:
+                        self.automation_queue.put(signal)
+            # Broadcast the frame as received to all connected clients,
+            # bursts of objects are coalesced into array frames (see broadcast.py)
+            await self.batcher.publish(text, frames.is_mergeable(text))
+        except Exception as e:
+            logger.error(f"Error handling upstream message: {e}", exc_info=True)
+
+    @staticmethod
+    def _connection_status_event(connected):
+        return {
+            "type": "connection_status",
+            "text": frames.connection_status(connected, circuit_breaker.breaker_states())
+        }
 
-    def on_external_message(self, ws, message):
+    async def _broadcast_frame(self, text, raw=False):
+        event = {
+            "type": "broadcast_message",
+            "text": text
+        }
+        if raw:
+            # Not a JSON object: clients get it on its own, as received
+            event["raw"] = True
+        await self.channel_layer.group_send(groups.BROADCAST, event)
+
+    async def _abroadcast_connection_status(self):
         try:
-            print(f"Received message from external server: {message}")
-            # Broadcast message to all connected clients
-            from .automation_handler import AutomationHandler
-            AutomationHandler.process_message(message)
-            async_to_sync(self.channel_layer.group_send)(
-                "trading",
-                {
-                    "type": "broadcast_message",
-                    "message": message
-                }
-            )
+            # aconnection_status: a non-leader reads the status from the
+            # cache, which must not block the event loop
+            event = self._connection_status_event(await self.aconnection_status())
+            await self.channel_layer.group_send(groups.BROADCAST, event)
         except Exception as e:
-            print(f"Error handling external message: {e}")
+            logger.error(f"Error broadcasting connection status: {e}")
 
     def broadcast_connection_status(self):
         try:
-            async_to_sync(self.channel_layer.group_send)(
-                "trading",
-                {
-                    "type": "connection_status",
-                    "is_external_connected": self.is_connected
-                }
-            )
-        except Exception as e:
-            print(f"Error broadcasting connection status: {e}") 
\ No newline at end of file
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            async_to_sync(self._abroadcast_connection_status)()
+        else:
+            # Called from code running on an event loop (e.g. a breaker
+            # tripping inside the async API client)
+            loop.create_task(self._abroadcast_connection_status())
@@ -0,0 +1,128 @@
+"""
+Frames sent to the dashboard websockets.
+
+Every group event carries its frame already encoded under ``text``. The
+sender builds it once, however many sockets are in the group, and
+TradingConsumer writes it out unchanged instead of serializing the same
+event again for every recipient. Several JSON object frames may be combined
+into one JSON array frame (see broadcast.py); clients accept both forms.
+Upstream frames that are not JSON objects are never combined, they go out
+on their own exactly as received.
+
+Sockets that negotiate the ``msgpack`` subprotocol get the same frames as
+binary msgpack. The JSON text stays the wire format of the channel layer;
+``pack`` converts it at most once per process (the result is memoized), so
+one event costs a single conversion however many msgpack sockets receive
+it, and nothing when none are connected. Packed frames are combined into
+arrays the same way as JSON ones (``merge_packed``).
+"""
+
+import functools
+import struct
+from typing import Any, Dict, List, Optional
+
+import msgpack
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+    import json
+
+MSGPACK_SUBPROTOCOL = 'msgpack'
+
+
+def encode(message: Dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(message).decode('utf-8')
+    return json.dumps(message)
+
+
+def connection_status(is_external_connected: bool, upstreams: Dict[str, str]) -> str:
+    return encode({
+        'type': 'connection_status',
+        'is_external_connected': is_external_connected,
+        'upstreams': upstreams,
+    })
+
+
+def trade_notification(response: Any, metadata: Optional[Dict[str, Any]] = None) -> str:
+    message = {
+        'type': 'mexc_trade',
+        'data': response,
+    }
+    if metadata is not None:
+        message['_metadata'] = metadata
+    return encode(message)
+
+
+def merge(texts: List[str]) -> str:
+    """
+    Combine encoded frames into one JSON array frame without decoding them.
+    Every frame is a JSON object or an array frame built by ``merge``; those
+    are spliced in, so merging never nests. A single frame is returned
+    unchanged.
+    """
+    if len(texts) == 1:
+        return texts[0]
+    parts = []
+    for text in texts:
+        text = text.strip()
+        if text.startswith('['):
+            inner = text[1:-1]
+            if inner:
+                parts.append(inner)
+        else:
+            parts.append(text)
+    return '[' + ','.join(parts) + ']'
+
+
+def is_mergeable(text: str) -> bool:
+    """
+    Only JSON objects go into array frames. An upstream frame that is an
+    array, or not JSON at all, is sent on its own so its boundaries survive.
+    """
+    return text.lstrip()[:1] == '{'
+
+
+def _decode(text: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+@functools.lru_cache(maxsize=256)
+def pack(text: str) -> bytes:
+    """
+    msgpack form of an encoded JSON frame.
+    """
+    return msgpack.packb(_decode(text))
+
+
+def _packed_items(frame: bytes):
+    # (item count, offset of the first item) of a packed frame, a frame that
+    # is not an array counts as one item
+    head = frame[0]
+    if 0x90 <= head <= 0x9f:
+        return head & 0x0f, 1
+    if head == 0xdc:
+        return struct.unpack_from('>H', frame, 1)[0], 3
+    if head == 0xdd:
+        return struct.unpack_from('>I', frame, 1)[0], 5
+    return 1, 0
+
+
+def merge_packed(packed: List[bytes]) -> bytes:
+    """
+    msgpack counterpart of ``merge``: one array frame, spliced without
+    unpacking the items.
+    """
+    if len(packed) == 1:
+        return packed[0]
+    count = 0
+    body = []
+    for frame in packed:
+        items, offset = _packed_items(frame)
+        count += items
+        body.append(frame[offset:])
+    return msgpack.Packer().pack_array_header(count) + b''.join(body)
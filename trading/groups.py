@@ -0,0 +1,27 @@
+"""
+Channel layer groups of the trading websocket.
+
+- BROADCAST: every dashboard; upstream token frames and connection status
+- user group: every socket of one user; control events for that user
+- account group: every socket whose user owns the trading account; trade
+  notifications for orders placed on that account
+"""
+
+import re
+
+BROADCAST = "trading"
+
+# Group names may only contain ASCII alphanumerics, hyphens, underscores and periods
+_INVALID = re.compile(r'[^0-9A-Za-z_.-]')
+
+
+def user_group(user_id) -> str:
+    return f"trading.user.{_INVALID.sub('_', str(user_id))}"
+
+
+def account_group(account_id) -> str:
+    return f"trading.account.{_INVALID.sub('_', str(account_id))}"
+
+
+def is_account_group(group: str) -> bool:
+    return group.startswith("trading.account.")
@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
+
+class AutomationQueue:
+    """
+    Bounded hand-off between the upstream websocket reader and automation.
+
+    The reader thread only enqueues; a fixed pool of worker threads runs the
+    handler (rule matching, account lookups, orders). When the queue is full
+    the overflow policy decides what happens:
+    - drop_oldest: discard the oldest queued message, never block the reader
+    - block: the reader waits for room, pushing back on the upstream socket
+    """
+    def __init__(self, handler: Callable[[Any], None], maxsize: int = 1000,
+                 workers: int = 2, overflow: str = DROP_OLDEST):
+        if overflow not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.handler = handler
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.workers = workers
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._busy = 0
+
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.high_watermark = 0
+        self._last_drop_log = 0.0
+
+    @classmethod
+    def from_settings(cls, handler: Callable[[Any], None]) -> "AutomationQueue":
+        return cls(
+            handler,
+            maxsize=settings.AUTOMATION_QUEUE_SIZE,
+            workers=settings.AUTOMATION_WORKERS,
+            overflow=settings.AUTOMATION_QUEUE_OVERFLOW,
+        )
+
+    def start(self) -> None:
+        with self._cond:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"automation-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def put(self, message: Any, timeout: Optional[float] = None) -> bool:
+        """
+        Enqueue a message for the workers. Returns False if it was not queued
+        (block policy timed out).
+        """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.overflow == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                    self._log_drop()
+                elif not self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout):
+                    self.dropped += 1
+                    self._log_drop()
+                    return False
+
+            self._items.append(message)
+            self.enqueued += 1
+            self.high_watermark = max(self.high_watermark, len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def _log_drop(self) -> None:
+        now = time.monotonic()
+        if now - self._last_drop_log >= 5:
+            self._last_drop_log = now
+            logger.warning(f"Automation queue full ({self.maxsize}), dropped {self.dropped} messages so far")
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._items)
+                message = self._items.popleft()
+                self._busy += 1
+                # Wake a reader blocked on a full queue
+                self._cond.notify_all()
+
+            close_old_connections()
+            try:
+                self.handler(message)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Automation worker failed: {e}", exc_info=True)
+            finally:
+                close_old_connections()
+                with self._cond:
+                    self._busy -= 1
+                    self.processed += 1
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'depth': len(self._items),
+                'maxsize': self.maxsize,
+                'high_watermark': self.high_watermark,
+                'busy_workers': self._busy,
+                'workers': self.workers,
+                'overflow': self.overflow,
+                'enqueued': self.enqueued,
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+            }
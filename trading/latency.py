@@ -0,0 +1,161 @@
+"""
+Signal-to-order latency of the automation pipeline.
+
+A Trace is started when an upstream frame arrives and stamped with
+time.monotonic() at each stage it reaches:
+
+    received -> parsed -> matched -> account_resolved -> order_sent
+             -> order_acked -> broadcast_sent
+
+``matched`` includes the wait in the automation queue. A signal that places
+several orders forks its trace, so every order carries its own
+account/order/broadcast stamps on top of the shared first ones. Orders the
+exchange rejected never reach ``order_acked``.
+
+Every stamp adds the time elapsed since ``received`` to that stage's
+histogram. stats() reports count and p50/p95/p99 per stage; percentiles are
+interpolated within fixed buckets (BUCKETS_MS). Trade notifications carry
+the stamps of their order under ``_metadata`` (see frames.trade_notification);
+``broadcast_sent`` is stamped after the notification went out, so it only
+appears in the histograms.
+
+Histograms are per process. The ingest leader, the only process that runs
+automation, copies them to the cache on every election tick so any worker
+can serve them (shared_stats).
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+PARSED = 'parsed'
+MATCHED = 'matched'
+ACCOUNT_RESOLVED = 'account_resolved'
+ORDER_SENT = 'order_sent'
+ORDER_ACKED = 'order_acked'
+BROADCAST_SENT = 'broadcast_sent'
+
+STAGES = (PARSED, MATCHED, ACCOUNT_RESOLVED, ORDER_SENT, ORDER_ACKED, BROADCAST_SENT)
+
+# Upper bounds in milliseconds, anything slower lands in the last (+Inf) bucket
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+STATS_KEY = 'trading:latency:stats'
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value_ms
+            self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else largest
+                # Never report more than was actually observed
+                upper = min(upper, largest)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return largest
+
+    def totals(self) -> Tuple[List[int], float]:
+        """
+        Per-bucket counts (+Inf last) and the sum, in milliseconds.
+        """
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum, 3),
+            'max_ms': round(self.max, 3),
+            'p50_ms': _round(self.percentile(0.50)),
+            'p95_ms': _round(self.percentile(0.95)),
+            'p99_ms': _round(self.percentile(0.99)),
+            'buckets': dict(zip([*self.buckets, '+Inf'], self.counts)),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+histograms: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+
+
+class Trace:
+    """
+    Stage stamps of one signal (or one of its orders, see fork).
+    """
+    __slots__ = ('started', 'stamps')
+
+    def __init__(self, started: Optional[float] = None, stamps: Optional[Dict[str, float]] = None):
+        self.started = time.monotonic() if started is None else started
+        self.stamps = {} if stamps is None else stamps
+
+    def mark(self, stage: str) -> None:
+        now = time.monotonic()
+        self.stamps[stage] = now
+        histograms[stage].observe((now - self.started) * 1000)
+
+    def fork(self) -> "Trace":
+        return Trace(self.started, dict(self.stamps))
+
+    def metadata(self) -> Dict[str, Any]:
+        """
+        Milliseconds from receipt to every stage reached so far.
+        """
+        return {
+            'latency_ms': {
+                stage: round((stamp - self.started) * 1000, 3)
+                for stage, stamp in self.stamps.items()
+            }
+        }
+
+
+def mark(trace: Optional[Trace], stage: str) -> None:
+    """
+    Stamp ``trace`` if there is one; callers outside the ingest path have none.
+    """
+    if trace is not None:
+        trace.mark(stage)
+
+
+def stats() -> Dict[str, Any]:
+    return {stage: histogram.snapshot() for stage, histogram in histograms.items()}
+
+
+def publish(ttl: float) -> None:
+    cache.set(STATS_KEY, stats(), ttl)
+
+
+def shared_stats(local: bool) -> Dict[str, Any]:
+    """
+    This process's histograms if it runs automation, else the leader's copy.
+    """
+    if local:
+        return stats()
+    return cache.get(STATS_KEY) or {}
@@ -0,0 +1,239 @@
+"""
+Leader election for the upstream websocket ingest.
+
+Only one process may read the upstream token feed and run automation,
+otherwise every Daphne worker would place the same orders. Each process runs
+an election thread; the process holding the ingest lock starts
+ExternalWebSocketService, the others only serve their own websocket clients,
+which receive token frames and notifications through the shared channel
+layer.
+
+Lock backends (settings.INGEST_LEADER_BACKEND):
+- file: an exclusive flock on INGEST_LEADER_LOCK_FILE. The kernel drops the
+  lock when the leader process dies, a follower takes over on its next
+  attempt (at most INGEST_LEADER_INTERVAL seconds later). Same host only.
+- redis: a key in REDIS_URL holding a per-process token with a
+  INGEST_LEADER_TTL expiry, renewed every INGEST_LEADER_INTERVAL seconds.
+  A dead leader is replaced within TTL + INTERVAL seconds.
+- none: every process is the leader (single process deployments).
+- auto (default): redis when REDIS_URL is set, file otherwise.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'trading:ingest:leader'
+
+
+class FileLeaderLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        import fcntl  # POSIX only
+
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{socket.gethostname()}:{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def renew(self) -> bool:
+        # Held for as long as the file stays open
+        return self._file is not None
+
+    def release(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RedisLeaderLock:
+    # Only touch the key while it still holds our token
+    RENEW_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('pexpire', KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url: str, ttl: float, key: str = LOCK_KEY):
+        self.client = redis.Redis.from_url(url, socket_timeout=ttl / 3, socket_connect_timeout=ttl / 3)
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._valid_until = 0.0
+
+    def acquire(self) -> bool:
+        started = time.monotonic()
+        try:
+            acquired = bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        except redis.RedisError as e:
+            logger.warning(f"Ingest leader lock unavailable: {e}")
+            return False
+        if acquired:
+            self._valid_until = started + self.ttl_ms / 1000
+        return acquired
+
+    def renew(self) -> bool:
+        started = time.monotonic()
+        try:
+            renewed = bool(self.client.eval(self.RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+        except redis.RedisError as e:
+            # Redis hiccup: the key cannot expire before our last renewal
+            # does, so keep leading until then
+            logger.warning(f"Could not renew ingest leader lock: {e}")
+            return time.monotonic() < self._valid_until
+        if renewed:
+            self._valid_until = started + self.ttl_ms / 1000
+        return renewed
+
+    def release(self) -> None:
+        try:
+            self.client.eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+        except redis.RedisError:
+            pass
+        self._valid_until = 0.0
+
+
+class AlwaysLeaderLock:
+    def acquire(self) -> bool:
+        return True
+
+    def renew(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        pass
+
+
+def lock_from_settings():
+    backend = settings.INGEST_LEADER_BACKEND
+    if backend == 'auto':
+        backend = 'redis' if settings.REDIS_URL else 'file'
+    if backend == 'redis':
+        return RedisLeaderLock(settings.REDIS_URL, settings.INGEST_LEADER_TTL)
+    if backend == 'file':
+        return FileLeaderLock(settings.INGEST_LEADER_LOCK_FILE)
+    if backend == 'none':
+        return AlwaysLeaderLock()
+    raise ValueError(f"Unknown INGEST_LEADER_BACKEND: {backend}")
+
+
+class LeaderElection:
+    """
+    Background thread that keeps trying to become (or stay) the leader and
+    calls ``on_elected`` / ``on_deposed`` on transitions. ``on_tick`` runs
+    after every attempt while this process leads, ``on_step`` after every
+    attempt in every process.
+    """
+    def __init__(self, lock, on_elected: Callable[[], None], on_deposed: Callable[[], None],
+                 on_tick: Optional[Callable[[], None]] = None, interval: float = 2.0,
+                 on_step: Optional[Callable[[], None]] = None):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.on_tick = on_tick
+        self.on_step = on_step
+        self.interval = interval
+        self.is_leader = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ingest-leader", daemon=True)
+        self._thread.start()
+        atexit.register(self.lock.release)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Ingest leader election failed: {e}", exc_info=True)
+            time.sleep(self.interval)
+
+    def _step(self) -> None:
+        if not self.is_leader:
+            if self.lock.acquire():
+                self.is_leader = True
+                logger.info(f"Process {os.getpid()} is now the ingest leader")
+                self.on_elected()
+        elif not self.lock.renew():
+            self.is_leader = False
+            logger.warning(f"Process {os.getpid()} lost the ingest leadership")
+            self.on_deposed()
+        if self.is_leader and self.on_tick is not None:
+            self.on_tick()
+        if self.on_step is not None:
+            self.on_step()
+
+
+_election: Optional[LeaderElection] = None
+
+
+def start_ingest_election() -> LeaderElection:
+    """
+    Start competing for the ingest in this process. Safe to call more than once.
+    """
+    global _election
+    if _election is not None:
+        return _election
+
+    from the_combiner_view import metrics as process_metrics
+
+    from . import latency
+    from .accounts import account_cache
+    from .external_service import ExternalWebSocketService
+    from .rule_index import rule_index
+
+    def on_elected():
+        account_cache.start()
+        ExternalWebSocketService.get_instance().start()
+
+    def on_deposed():
+        ExternalWebSocketService.get_instance().stop()
+
+    def on_tick():
+        ExternalWebSocketService.get_instance().publish_status()
+        latency.publish(settings.INGEST_LEADER_TTL + settings.INGEST_LEADER_INTERVAL)
+        # Rules edited in another worker only reach this process through the cache
+        if rule_index.sync():
+            account_cache.prefetch(rule_index.account_ids())
+
+    def on_step():
+        # Every worker's samples, for /metrics answered by any of them
+        process_metrics.publish(settings.INGEST_LEADER_TTL + settings.INGEST_LEADER_INTERVAL)
+
+    _election = LeaderElection(lock_from_settings(), on_elected, on_deposed, on_tick,
+                               interval=settings.INGEST_LEADER_INTERVAL, on_step=on_step)
+    _election.start()
+    return _election
@@ -0,0 +1,109 @@
+"""
+Check that the configured channel layer delivers group messages across
+processes, which is what multiple Daphne workers rely on.
+
+    python manage.py check_channel_layer
+    python manage.py check_channel_layer --fake-redis   # needs requirements-dev.txt
+
+A child process sends --messages group messages; this process must receive
+all of them. The in-memory layer fails the check by design.
+"""
+
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+GROUP = 'channel_layer_check'
+
+
+def _send_from_child(backend: str, config: dict, count: int) -> None:
+    async def send():
+        layer = import_string(backend)(**config)
+        for sequence in range(count):
+            await layer.group_send(GROUP, {
+                'type': 'layer.check',
+                'sequence': sequence,
+                'sent': time.time(),
+            })
+    asyncio.run(send())
+
+
+class Command(BaseCommand):
+    help = 'Check cross-process group delivery of the channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fake-redis', action='store_true',
+                            help='Run against an in-process fake Redis server instead of REDIS_URL')
+        parser.add_argument('--messages', type=int, default=100)
+        parser.add_argument('--timeout', type=float, default=5.0,
+                            help='Seconds to wait for each message')
+
+    def handle(self, *args, **options):
+        server = None
+        if options['fake_redis']:
+            server, backend, config = self._fake_redis()
+        else:
+            layer_settings = settings.CHANNEL_LAYERS['default']
+            backend, config = layer_settings['BACKEND'], layer_settings.get('CONFIG', {})
+
+        self.stdout.write(f"Channel layer: {backend}")
+        try:
+            latencies = asyncio.run(self._check(backend, config, options['messages'], options['timeout']))
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        if len(latencies) < options['messages']:
+            raise CommandError(
+                f"Received {len(latencies)}/{options['messages']} messages from another process, "
+                "the channel layer is not shared between workers"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Received {len(latencies)}/{options['messages']} messages from another process "
+            f"(p50 {statistics.median(latencies):.2f} ms, max {max(latencies):.2f} ms)"
+        ))
+
+    def _fake_redis(self):
+        try:
+            from fakeredis import TcpFakeServer
+        except ImportError:
+            raise CommandError('--fake-redis needs the fakeredis[lua] package (pip install -r requirements-dev.txt)')
+        import threading
+
+        server = TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        config = {'hosts': [f'redis://{host}:{port}/0'], **settings.CHANNEL_LAYER_CONFIG}
+        return server, 'channels_redis.core.RedisChannelLayer', config
+
+    async def _check(self, backend, config, count, timeout):
+        layer = import_string(backend)(**config)
+
+        channel = await layer.new_channel()
+        await layer.group_add(GROUP, channel)
+
+        child = multiprocessing.get_context('spawn').Process(
+            target=_send_from_child, args=(backend, config, count), daemon=True
+        )
+        child.start()
+
+        latencies = []
+        try:
+            while len(latencies) < count:
+                try:
+                    message = await asyncio.wait_for(layer.receive(channel), timeout)
+                except asyncio.TimeoutError:
+                    break
+                latencies.append((time.time() - message['sent']) * 1000)
+        finally:
+            await layer.group_discard(GROUP, channel)
+            child.join(timeout)
+            if child.is_alive():
+                child.terminate()
+        return latencies
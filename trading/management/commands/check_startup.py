@@ -0,0 +1,73 @@
+"""
+Measure what loading the project costs a management command.
+
+    python manage.py check_startup
+
+A fresh interpreter runs ``django.setup()`` with an audit hook recording
+every outgoing socket connection. The check fails if app loading exceeds
+settings.STARTUP_BUDGET_MS, opens a connection or leaves background
+threads behind.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROBE = """
+import json, sys, threading, time
+
+connections = []
+
+def audit(event, args):
+    if event == 'socket.connect':
+        connections.append(repr(args[1]))
+
+sys.addaudithook(audit)
+started = time.perf_counter()
+import django
+django.setup()
+elapsed = (time.perf_counter() - started) * 1000
+# Give anything started in the background a moment to dial out
+time.sleep(0.5)
+threads = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+print(json.dumps({'ms': elapsed, 'connections': connections, 'threads': threads}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Check that loading the project is fast and starts no network activity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float, default=settings.STARTUP_BUDGET_MS)
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Fresh interpreters to measure, the fastest run is compared to the budget')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'the_combiner_view.settings'))
+        results = []
+        for _ in range(options['runs']):
+            probe = subprocess.run([sys.executable, '-c', PROBE], env=env, cwd=settings.BASE_DIR,
+                                   capture_output=True, text=True, timeout=60)
+            if probe.returncode != 0:
+                raise CommandError(f"django.setup() failed:\n{probe.stderr}")
+            results.append(json.loads(probe.stdout.strip().splitlines()[-1]))
+
+        fastest = min(result['ms'] for result in results)
+        connections = sorted({c for result in results for c in result['connections']})
+        threads = sorted({t for result in results for t in result['threads']})
+
+        self.stdout.write(f"django.setup(): {fastest:.0f} ms (fastest of {len(results)}), budget {options['budget_ms']:.0f} ms")
+        problems = []
+        if fastest > options['budget_ms']:
+            problems.append(f"app loading is over budget by {fastest - options['budget_ms']:.0f} ms")
+        if connections:
+            problems.append(f"socket connections during startup: {', '.join(connections)}")
+        if threads:
+            problems.append(f"background threads started: {', '.join(threads)}")
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('No sockets opened, no background threads started'))
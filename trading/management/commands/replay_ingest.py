@@ -0,0 +1,173 @@
+"""
+Replay a recording of upstream frames into automation (see recording.py).
+
+    python manage.py replay_ingest ingest.rec                # original speed
+    python manage.py replay_ingest ingest.rec --speed 10     # 10x faster
+    python manage.py replay_ingest ingest.rec --speed 0      # as fast as possible
+
+Frames go through the same path as live ones: parsed into TokenSignals,
+queued on an AutomationQueue and handled by AutomationHandler.process_message
+with the automation rules of the configured database. Orders and account
+lookups hit a local stub API (trading/stub_api.py), never the real trading
+API, and trade notifications go to a private in-memory channel layer.
+
+The report shows throughput and the per-stage latency of latency.py;
+--json writes it to a file for comparing runs.
+"""
+
+import json
+import logging
+import os
+import time
+
+from channels.layers import channel_layers
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from the_combiner_view.channel_layers import LocalChannelLayer
+from trading import latency
+from trading.ingest import BLOCK, DROP_OLDEST, AutomationQueue
+from trading.messages import InvalidMessage, parse_message
+from trading.recording import read_recording
+from trading.stub_api import StubApiServer
+
+
+class Command(BaseCommand):
+    help = 'Replay recorded upstream frames into automation against stub APIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('recording', help='File written with INGEST_RECORD_PATH')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Replay speed factor, 0 replays as fast as possible')
+        parser.add_argument('--limit', type=int, default=0, help='Replay at most this many frames')
+        parser.add_argument('--stub-latency-ms', type=float, default=20,
+                            help='Response time of the stub trading/classifier API')
+        parser.add_argument('--workers', type=int, default=settings.AUTOMATION_WORKERS)
+        parser.add_argument('--overflow', choices=(BLOCK, DROP_OLDEST), default=BLOCK,
+                            help='Automation queue overflow policy (block drops nothing)')
+        parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['recording']):
+            raise CommandError(f"No such recording: {options['recording']}")
+        if options['speed'] < 0:
+            raise CommandError('--speed must be 0 or positive')
+        if options['verbosity'] < 2:
+            # One INFO record per signal would drown the report
+            logging.getLogger('trading').setLevel(logging.WARNING)
+
+        stub = StubApiServer(latency=options['stub_latency_ms'] / 1000).start()
+        try:
+            handler = self._use_stub(stub)
+            report = self._replay(handler, options)
+            report['stub_orders'] = stub.orders
+        finally:
+            stub.stop()
+
+        self._print_report(report)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def _use_stub(self, stub: StubApiServer):
+        os.environ['TRADE_API_URL'] = os.environ['DEV_TRADE_API_URL'] = stub.url
+        os.environ['CLASSIFIER_API_URL'] = os.environ['DEV_CLASSIFIER_API_URL'] = stub.url
+
+        from the_combiner_view.api_utils import TradeExternalApis
+        from trading import automation_handler
+        from trading.accounts import account_cache
+        from trading.rule_index import rule_index
+
+        # Clients built at import time still point at the real API
+        automation_handler.trade_api = TradeExternalApis()
+        account_cache.fetch = automation_handler.trade_api.get_trading_account
+        channel_layers.set('default', LocalChannelLayer())
+
+        self.stdout.write(f"{len(rule_index)} enabled automation rules, stub API at {stub.url}")
+        # Warm the account cache like the ingest leader does at election
+        for account in rule_index.account_ids():
+            try:
+                account_cache.get(int(account))
+            except ValueError:
+                pass
+        return automation_handler.AutomationHandler.process_message
+
+    def _replay(self, handler, options):
+        queue = AutomationQueue(handler, maxsize=settings.AUTOMATION_QUEUE_SIZE,
+                                workers=options['workers'], overflow=options['overflow'])
+        queue.start()
+
+        speed, limit = options['speed'], options['limit']
+        frames = signals = invalid = 0
+        first_received = None
+        max_lag = 0.0
+        started = time.monotonic()
+        for received, frame in read_recording(options['recording']):
+            if limit and frames >= limit:
+                break
+            if first_received is None:
+                first_received = received
+            if speed > 0:
+                due = started + (received - first_received) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            frames += 1
+
+            trace = latency.Trace()
+            try:
+                signal = parse_message(frame, trace=trace)
+            except InvalidMessage:
+                invalid += 1
+                continue
+            if signal.is_tokens:
+                trace.mark(latency.PARSED)
+                queue.put(signal)
+                signals += 1
+        fed = time.monotonic() - started
+
+        while True:
+            stats = queue.stats()
+            if stats['processed'] + stats['dropped'] >= stats['enqueued'] and not stats['busy_workers']:
+                break
+            time.sleep(0.01)
+        elapsed = time.monotonic() - started
+
+        return {
+            'recording': options['recording'],
+            'speed': speed,
+            'frames': frames,
+            'token_signals': signals,
+            'invalid_frames': invalid,
+            'feed_seconds': round(fed, 3),
+            'elapsed_seconds': round(elapsed, 3),
+            'frames_per_second': round(frames / elapsed, 1) if elapsed else None,
+            'signals_per_second': round(signals / elapsed, 1) if elapsed else None,
+            'max_schedule_lag_ms': round(max_lag * 1000, 3),
+            'queue': queue.stats(),
+            'stages': {
+                stage: {key: value for key, value in snapshot.items() if key != 'buckets'}
+                for stage, snapshot in latency.stats().items()
+            },
+        }
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f"Replayed {report['frames']} frames ({report['token_signals']} token signals, "
+            f"{report['invalid_frames']} invalid) in {report['elapsed_seconds']} s: "
+            f"{report['frames_per_second']} frames/s, {report['signals_per_second']} signals/s"
+        )
+        self.stdout.write(
+            f"Orders acknowledged by the stub: {report['stub_orders']}, "
+            f"queue dropped: {report['queue']['dropped']}, high watermark: {report['queue']['high_watermark']}"
+        )
+        if report['speed'] > 0:
+            self.stdout.write(f"Largest lag behind the recorded schedule: {report['max_schedule_lag_ms']} ms")
+
+        self.stdout.write(f"\n{'stage':<18}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for stage, stats in report['stages'].items():
+            cells = [stats[key] for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+            rendered = ''.join(f"{'-' if cell is None else cell:>10}" for cell in cells)
+            self.stdout.write(f"{stage:<18}{stats['count']:>8}{rendered}{stats['max_ms']:>10}")
@@ -0,0 +1,96 @@
+"""
+Parsing of frames received from the upstream token websocket.
+
+Each frame is decoded exactly once, at ingest, into a TokenSignal. The signal
+keeps the frame text exactly as it arrived so it can be re-broadcast to the
+dashboards without serializing it again, and carries the decoded payload to
+automation so nothing downstream parses the frame a second time.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+    import json
+
+
+class InvalidMessage(ValueError):
+    """
+    Raised when an upstream frame is not a well-formed message.
+    """
+
+
+def _loads(frame: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(frame)
+    return json.loads(frame)
+
+
+def _is_valid_token(token: Any) -> bool:
+    return (
+        isinstance(token, dict)
+        and isinstance(token.get('token'), str)
+        and isinstance(token.get('exchange', ''), str)
+        and isinstance(token.get('market', ''), str)
+    )
+
+
+@dataclass(frozen=True)
+class TokenSignal:
+    """
+    A decoded upstream message.
+
+    type: message type, 'tokens' for listing signals
+    data: token dicts for 'tokens' messages ({'token', 'exchange', 'market', ...});
+          entries that are not objects, or whose token, exchange or market is
+          not a string, are left out
+    text: the frame exactly as received, for re-sending
+    payload: the full decoded message
+    trace: stage timestamps of the ingest path (see latency.py), if any
+    """
+    type: str
+    data: Tuple[Dict[str, Any], ...] = ()
+    text: str = ''
+    payload: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+    trace: Any = field(default=None, compare=False, repr=False)
+
+    @property
+    def is_tokens(self) -> bool:
+        return self.type == 'tokens'
+
+    @classmethod
+    def from_payload(cls, payload: Any, text: str = '', trace: Any = None) -> "TokenSignal":
+        """
+        Validate an already decoded message.
+        """
+        if not isinstance(payload, dict):
+            raise InvalidMessage(f"Expected a JSON object, got {type(payload).__name__}")
+
+        message_type = payload.get('type')
+        if not isinstance(message_type, str):
+            raise InvalidMessage("Message has no 'type'")
+
+        data = ()
+        if message_type == 'tokens':
+            tokens = payload.get('data') or []
+            if not isinstance(tokens, list):
+                raise InvalidMessage("'data' of a tokens message must be a list")
+            # A malformed entry only loses itself, the rest of the signal still trades
+            data = tuple(token for token in tokens if _is_valid_token(token))
+
+        return cls(type=message_type, data=data, text=text, payload=payload, trace=trace)
+
+
+def parse_message(frame: Union[str, bytes], trace: Any = None) -> TokenSignal:
+    """
+    Decode and validate a raw upstream frame.
+    """
+    try:
+        payload = _loads(frame)
+    except ValueError as e:
+        raise InvalidMessage(f"Frame is not valid JSON: {e}") from e
+    text = frame.decode('utf-8') if isinstance(frame, bytes) else frame
+    return TokenSignal.from_payload(payload, text=text, trace=trace)
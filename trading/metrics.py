@@ -0,0 +1,145 @@
+"""
+Trading metrics for /metrics (see the_combiner_view/metrics.py).
+
+Counters are incremented inline by the ingest reader, automation and the
+dashboard consumer. Queue, broadcast, latency and breaker figures already
+kept elsewhere are read by ``collect`` at scrape time.
+"""
+
+from collections import Counter as Tally
+from threading import Lock
+from typing import List
+
+from the_combiner_view import circuit_breaker
+from the_combiner_view.metrics import Counter, Family, Gauge, histogram_samples, register_collector
+
+from . import broadcast, groups, latency
+
+ingest_frames = Counter(
+    'combiner_ingest_frames_total', 'Upstream websocket frames received, by message type.', ('type',),
+)
+ingest_connections = Counter(
+    'combiner_ingest_connections_total', 'Upstream websocket connections opened; above 1 means reconnects.',
+)
+ingest_disconnects = Counter(
+    'combiner_ingest_disconnects_total', 'Upstream websocket connections lost or refused.',
+)
+rule_evaluations = Counter(
+    'combiner_rule_evaluations_total', 'Token signals evaluated against the automation rules.',
+)
+rule_matches = Counter(
+    'combiner_rule_matches_total', 'Automation rules matched by token signals.',
+)
+orders = Counter(
+    'combiner_orders_total', 'Orders sent by automation, by outcome (acked, rejected, failed).', ('outcome',),
+)
+websocket_connections = Gauge(
+    'combiner_websocket_connections', 'Open dashboard websockets, by protocol.', ('protocol',),
+)
+
+_group_members = Tally()
+_group_lock = Lock()
+
+
+def _group_kind(group: str) -> str:
+    if group == groups.BROADCAST:
+        return 'broadcast'
+    if groups.is_account_group(group):
+        return 'account'
+    return 'user'
+
+
+def group_joined(group: str) -> None:
+    with _group_lock:
+        _group_members[group] += 1
+
+
+def group_left(group: str) -> None:
+    with _group_lock:
+        _group_members[group] -= 1
+        if _group_members[group] <= 0:
+            del _group_members[group]
+
+
+def _group_families() -> List[Family]:
+    with _group_lock:
+        members = dict(_group_members)
+    groups_by_kind = Family('combiner_websocket_groups', 'gauge', "Groups with sockets in this worker, by kind.")
+    fan_out = Family('combiner_websocket_group_members', 'gauge', "Sockets in this worker's groups, by kind.")
+    largest = Family('combiner_websocket_group_fanout_max', 'gauge', "Largest fan-out of one group in this worker, by kind.")
+    for kind in ('broadcast', 'user', 'account'):
+        sizes = [size for group, size in members.items() if _group_kind(group) == kind]
+        groups_by_kind.add(len(sizes), kind=kind)
+        fan_out.add(sum(sizes), kind=kind)
+        largest.add(max(sizes, default=0), kind=kind)
+    return [groups_by_kind, fan_out, largest]
+
+
+def _ingest_families() -> List[Family]:
+    from .external_service import ExternalWebSocketService
+
+    service = ExternalWebSocketService.get_instance()
+    queue = service.automation_queue.stats()
+    families = [
+        Family('combiner_ingest_leader', 'gauge', 'Whether this process runs the upstream ingest.')
+        .add(int(service.is_running)),
+        Family('combiner_ingest_connected', 'gauge', 'Upstream websocket connected (ingest leader only).')
+        .add(int(service.is_running and service.is_connected)),
+        Family('combiner_automation_queue_depth', 'gauge', 'Signals waiting for an automation worker.')
+        .add(queue['depth']),
+        Family('combiner_automation_queue_high_watermark', 'gauge', 'Deepest the automation queue has been.')
+        .add(queue['high_watermark']),
+        Family('combiner_automation_busy_workers', 'gauge', 'Automation workers handling a signal.')
+        .add(queue['busy_workers']),
+    ]
+    for key in ('enqueued', 'processed', 'failed', 'dropped'):
+        families.append(Family(f'combiner_automation_queue_{key}_total', 'counter',
+                               f'Signals {key} by the automation queue.').add(queue[key]))
+    return families
+
+
+def _broadcast_families() -> List[Family]:
+    stats = broadcast.stats()
+    counters = {
+        'broadcast_events': ('combiner_broadcast_events_total', 'Group sends of upstream frames, batches included.'),
+        'batched_frames': ('combiner_broadcast_batched_frames_total', 'Upstream frames sent as part of a batch.'),
+        'client_writes': ('combiner_broadcast_client_writes_total', 'Websocket writes to dashboards.'),
+        'client_dropped': ('combiner_broadcast_client_dropped_total', 'Token frames dropped from full dashboard outboxes.'),
+        'status_collapsed': ('combiner_broadcast_status_collapsed_total',
+                             'Connection status frames replaced by a newer one before sending.'),
+    }
+    return [
+        Family(name, 'counter', documentation).add(stats[key])
+        for key, (name, documentation) in counters.items()
+    ]
+
+
+def _latency_family() -> Family:
+    family = Family('combiner_signal_stage_latency_seconds', 'histogram',
+                    'Time from an upstream frame arriving to each automation stage.')
+    buckets = [bound / 1000 for bound in latency.BUCKETS_MS]
+    for stage, histogram in latency.histograms.items():
+        counts, total_ms = histogram.totals()
+        histogram_samples(family, buckets, counts, total_ms / 1000, {'stage': stage})
+    return family
+
+
+def _breaker_family() -> Family:
+    family = Family('combiner_upstream_circuit_state', 'gauge', 'Upstream circuit breaker state (1 for the current one).')
+    for name, state in circuit_breaker.breaker_states().items():
+        for candidate in (circuit_breaker.CLOSED, circuit_breaker.OPEN, circuit_breaker.HALF_OPEN):
+            family.add(int(state == candidate), api=name, state=candidate)
+    return family
+
+
+def collect() -> List[Family]:
+    return [
+        *_ingest_families(),
+        *_broadcast_families(),
+        *_group_families(),
+        _latency_family(),
+        _breaker_family(),
+    ]
+
+
+register_collector(collect)
@@ -0,0 +1,88 @@
+"""
+Recording of upstream websocket traffic for offline replay.
+
+When settings.INGEST_RECORD_PATH is set, the ingest leader appends every
+inbound frame to that file with its arrival time (see
+ExternalWebSocketService._on_message). ``manage.py replay_ingest`` feeds a
+recording back into automation.
+
+File format: the 8 byte header ``MAGIC``, then one record per frame:
+a little-endian float64 arrival time (time.time()), a uint32 payload length
+and the frame as UTF-8. Files are only ever appended to; a recording cut
+short by a crash ends at the last complete record.
+"""
+
+import logging
+import struct
+import threading
+import time
+from typing import Iterator, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CVREC01\n'
+_RECORD = struct.Struct('<dI')
+
+# Seconds between flushes of the write buffer
+FLUSH_INTERVAL = 1.0
+
+
+class FrameRecorder:
+    """
+    Appends frames to a recording. The file is opened on the first frame;
+    writes go to a buffer that is flushed at most every FLUSH_INTERVAL
+    seconds, so recording costs the reader no syscall per frame.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = 0
+        self._file = None
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        self._file = open(self.path, 'ab', buffering=1 << 16)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        logger.info(f"Recording upstream frames to {self.path}")
+
+    def record(self, frame: Union[str, bytes], received: float = None) -> None:
+        payload = frame.encode('utf-8') if isinstance(frame, str) else frame
+        received = time.time() if received is None else received
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+                self._file.write(_RECORD.pack(received, len(payload)))
+                self._file.write(payload)
+                self.frames += 1
+                now = time.monotonic()
+                if now - self._last_flush >= FLUSH_INTERVAL:
+                    self._file.flush()
+                    self._last_flush = now
+            except OSError as e:
+                logger.error(f"Could not record upstream frame to {self.path}: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, str]]:
+    """
+    Yield (arrival time, frame) for every complete record in a recording.
+    """
+    with open(path, 'rb') as recording:
+        if recording.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an upstream frame recording")
+        while True:
+            header = recording.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            received, length = _RECORD.unpack(header)
+            payload = recording.read(length)
+            if len(payload) < length:
+                return
+            yield received, payload.decode('utf-8', errors='replace')
@@ -0,0 +1,201 @@
+import logging
+import threading
+from typing import Dict, List, Any, NamedTuple, Optional, Set, Tuple
+
+from django.core.cache import cache
+
+from .models import AutomationRule
+
+logger = logging.getLogger(__name__)
+
+# Bumped in Django's cache whenever a rule changes, so the process running
+# automation notices edits made through another worker
+GENERATION_KEY = 'trading:rule_index:generation'
+
+
+def normalize_exchange_name(exchange: str) -> str:
+    """
+    Normalize exchange names for comparison by removing spaces and special characters
+    and converting to lowercase
+    """
+    return ''.join(e for e in exchange.lower() if e.isalnum())
+
+
+class CompiledRule(NamedTuple):
+    """
+    Immutable snapshot of an enabled AutomationRule, with exchanges pre-normalized.
+    """
+    id: int
+    account: str
+    amount_usdt: float
+    market_type: str
+    exchanges: Tuple[str, ...]
+
+
+# Bucket for rules that name any Coinbase venue: every Coinbase flavour
+# ("coinbase", "coinbaseexchange", "coinbaseinternational") matches every other
+COINBASE = 'coinbase'
+
+
+class RuleIndex:
+    """
+    In-process index of enabled automation rules.
+
+    Rules are keyed by (market_type, normalized exchange), so matching a
+    tokens message is a couple of dictionary lookups per token instead of a
+    database query plus a string comparison per rule and exchange. The index
+    is built from the database on first use and then kept current by the
+    post_save/post_delete receivers in signals.py. Other processes pick up
+    the change through ``publish_change``/``sync``.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rules: Optional[Dict[int, CompiledRule]] = None
+        self._by_exchange: Dict[Tuple[str, str], Set[int]] = {}
+        self._generation: Optional[int] = None
+
+    @staticmethod
+    def compile(rule: AutomationRule) -> CompiledRule:
+        exchanges = rule.exchanges if isinstance(rule.exchanges, list) else [rule.exchanges]
+        return CompiledRule(
+            id=rule.id,
+            account=rule.account,
+            amount_usdt=rule.amount_usdt,
+            market_type=rule.market_type,
+            exchanges=tuple(sorted({normalize_exchange_name(str(e)) for e in exchanges if e})),
+        )
+
+    @staticmethod
+    def _keys(rule: CompiledRule) -> Set[Tuple[str, str]]:
+        keys = {(rule.market_type, exchange) for exchange in rule.exchanges}
+        if any(COINBASE in exchange for exchange in rule.exchanges):
+            keys.add((rule.market_type, COINBASE))
+        return keys
+
+    def _add(self, rule: CompiledRule) -> None:
+        self._rules[rule.id] = rule
+        for key in self._keys(rule):
+            self._by_exchange.setdefault(key, set()).add(rule.id)
+
+    def _remove(self, rule_id: int) -> None:
+        rule = self._rules.pop(rule_id, None)
+        if rule is None:
+            return
+        for key in self._keys(rule):
+            bucket = self._by_exchange.get(key)
+            if bucket is not None:
+                bucket.discard(rule_id)
+                if not bucket:
+                    del self._by_exchange[key]
+
+    def _ensure_built(self) -> None:
+        if self._rules is not None:
+            return
+        with self._lock:
+            if self._rules is not None:
+                return
+            rules = [self.compile(rule) for rule in AutomationRule.objects.filter(status='enabled')]
+            self._by_exchange = {}
+            self._rules = {}
+            for rule in rules:
+                self._add(rule)
+            logger.info(f"Automation rule index built with {len(rules)} enabled rules")
+
+    def update(self, rule: AutomationRule) -> None:
+        """
+        Re-index a single rule after it was saved.
+        """
+        with self._lock:
+            if self._rules is None:
+                return
+            self._remove(rule.id)
+            if rule.status == 'enabled':
+                self._add(self.compile(rule))
+
+    def discard(self, rule_id: int) -> None:
+        """
+        Drop a single rule after it was deleted.
+        """
+        with self._lock:
+            if self._rules is None:
+                return
+            self._remove(rule_id)
+
+    def invalidate(self) -> None:
+        """
+        Forget everything, the next lookup rebuilds from the database.
+        """
+        with self._lock:
+            self._rules = None
+            self._by_exchange = {}
+
+    def publish_change(self) -> None:
+        """
+        Tell other processes that the rules changed.
+        """
+        cache.add(GENERATION_KEY, 0, None)
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Evicted between add and incr, the next sync rebuilds anyway
+            return
+        with self._lock:
+            # Already applied locally by the signal receiver
+            if self._generation == generation - 1:
+                self._generation = generation
+
+    def sync(self) -> bool:
+        """
+        Drop the index if another process changed the rules since the last
+        sync. Returns True if it was dropped.
+        """
+        generation = cache.get(GENERATION_KEY, 0)
+        with self._lock:
+            if generation == self._generation:
+                return False
+            self._generation = generation
+            self.invalidate()
+            return True
+
+    def account_ids(self) -> Set[str]:
+        """
+        Accounts referenced by enabled rules.
+        """
+        with self._lock:
+            self._ensure_built()
+            return {rule.account for rule in self._rules.values()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_built()
+            return len(self._rules)
+
+    def match(self, tokens_data: List[Dict[str, Any]]) -> List[Tuple[CompiledRule, List[Dict[str, Any]]]]:
+        """
+        Return (rule, matching tokens) pairs for a tokens message, in rule id order.
+        As before, the market of the first token decides the market of the message.
+        """
+        token_market = tokens_data[0].get('market', '').lower()
+        markets = ('both', token_market)
+
+        with self._lock:
+            self._ensure_built()
+            rules = self._rules
+            by_exchange = self._by_exchange
+            matches: Dict[int, List[Dict[str, Any]]] = {}
+            for token in tokens_data:
+                exchange = token.get('exchange')
+                if not exchange:
+                    continue
+                normalized = normalize_exchange_name(exchange)
+                rule_ids: Set[int] = set()
+                for market in markets:
+                    rule_ids |= by_exchange.get((market, normalized), set())
+                    if COINBASE in normalized:
+                        rule_ids |= by_exchange.get((market, COINBASE), set())
+                for rule_id in rule_ids:
+                    matches.setdefault(rule_id, []).append(token)
+            return [(rules[rule_id], matches[rule_id]) for rule_id in sorted(matches)]
+
+
+rule_index = RuleIndex()
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .accounts import account_cache
+from .models import AutomationRule
+from .rule_index import rule_index
+
+
+@receiver(post_save, sender=AutomationRule)
+def reindex_automation_rule(sender, instance, **kwargs):
+    transaction.on_commit(lambda: rule_index.update(instance))
+    transaction.on_commit(rule_index.publish_change)
+    if instance.status == 'enabled':
+        # Warm the account before the rule's first order needs it
+        transaction.on_commit(lambda: account_cache.prefetch([instance.account]))
+
+
+@receiver(post_delete, sender=AutomationRule)
+def unindex_automation_rule(sender, instance, **kwargs):
+    rule_id = instance.id
+    transaction.on_commit(lambda: rule_index.discard(rule_id))
+    transaction.on_commit(rule_index.publish_change)
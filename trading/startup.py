@@ -0,0 +1,68 @@
+"""
+Background services of the ASGI server process.
+
+Nothing here runs from ``TradingConfig.ready()``: management commands, the
+test runner and shells only load models and settings, they never start
+threads or open sockets. The ASGI entry point (asgi.py) calls
+``start_services()`` once the application is built, so only Daphne workers
+warm the HTTP pools and compete for the upstream ingest (see leader.py).
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_lock = threading.Lock()
+
+
+def _server_loop() -> Optional[asyncio.AbstractEventLoop]:
+    # Daphne runs the application on the asyncio loop behind its Twisted
+    # reactor. It exists, but is not running yet, when asgi.py is imported
+    daphne_server = sys.modules.get('daphne.server')
+    return getattr(daphne_server, 'twisted_loop', None)
+
+
+def start_services() -> None:
+    """
+    Start the pool keep-alive and the ingest leader election. Safe to call
+    more than once.
+    """
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+    from the_combiner_view import http_pool
+    from the_combiner_view.api_utils import TradeExternalApis, ClassifierExternalApis
+    from .external_service import ExternalWebSocketService
+    from .leader import start_ingest_election
+
+    started = time.perf_counter()
+
+    # Register both upstream pools, then warm them in the background so
+    # the first order does not pay for connection setup
+    TradeExternalApis()
+    ClassifierExternalApis()
+    http_pool.start_keepalive()
+
+    # Only the elected process reads the upstream feed and runs automation,
+    # on the server's own event loop when there is one
+    loop = _server_loop()
+    if loop is not None:
+        ExternalWebSocketService.get_instance().use_loop(loop)
+    start_ingest_election()
+
+    elapsed = (time.perf_counter() - started) * 1000
+    if elapsed > settings.STARTUP_BUDGET_MS:
+        logger.warning(f"Background services took {elapsed:.0f} ms to start, budget is {settings.STARTUP_BUDGET_MS} ms")
+    else:
+        logger.info(f"Background services started in {elapsed:.0f} ms")
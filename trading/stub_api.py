@@ -0,0 +1,135 @@
+"""
+Stand-in for the trading and classifier APIs, for replay_ingest and the
+benchmarks (benchmarks/suite.py). Lives here rather than in benchmarks so
+the management command works where only the app is installed.
+
+StubApiServer answers on a local port after a fixed ``latency`` per request.
+A share ``error_rate`` of requests fails with 503 instead:
+- GET /accounts/<id>: a MEXC trading account with that id
+- POST /mexc/spot/<id>/order: an acknowledged order echoing the request
+- GET /accounts/user/<name>: two MEXC accounts
+- GET /config/channels/, /config/exchanges/, /tokens/latest/: classifier lists
+- anything else: an empty JSON list for GETs, {"ok": true} otherwise
+
+Point TRADE_API_URL and CLASSIFIER_API_URL at ``url`` to use it.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Any
+
+EXCHANGES = ['Binance', 'Bybit', 'Kucoin', 'OKX', 'Upbit']
+
+CHANNELS = [{'id': index, 'name': f'stub-channel-{index}'} for index in range(1, 11)]
+
+LATEST_TOKENS = [
+    {'token': f'STUB{index}', 'exchange': EXCHANGES[index % len(EXCHANGES)], 'market': 'spot',
+     'timestamp': '2024-01-01T00:00:00Z'}
+    for index in range(10)
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer the response and send it in one write when the request is
+    # done; headers and body in separate segments stall keep-alive clients
+    # on Nagle and delayed ACKs (~40 ms per request)
+    wbufsize = -1
+    server: "StubApiServer"
+
+    def _send(self, body: Any, status: int = 200) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.server.wait():
+            return self._send({'detail': 'injected error'}, 503)
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[:2] == ['accounts', 'user'] and len(parts) == 3:
+            return self._send({'status': 'success', 'accounts': [
+                {'id': 1, 'name': 'stub-1', 'exchange': 'mexc'},
+                {'id': 2, 'name': 'stub-2', 'exchange': 'mexc'},
+            ]})
+        if parts[0] == 'accounts' and len(parts) == 2 and parts[1].isdigit():
+            return self._send({'id': int(parts[1]), 'name': f'stub-{parts[1]}', 'exchange': 'MEXC'})
+        if parts == ['config', 'channels']:
+            return self._send(CHANNELS)
+        if parts == ['config', 'exchanges']:
+            return self._send([{'id': index, 'name': name} for index, name in enumerate(EXCHANGES, 1)])
+        if parts == ['tokens', 'latest']:
+            return self._send(LATEST_TOKENS)
+        if parts == ['health']:
+            return self._send({'status': 'ok'})
+        return self._send([])
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.server.wait():
+            return self._send({'detail': 'injected error'}, 503)
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[:2] == ['mexc', 'spot'] and parts[-1] == 'order':
+            self.server.orders += 1
+            return self._send({'orderId': f'stub-{next(self.server.order_ids)}', 'status': 'FILLED', **body})
+        return self._send({'ok': True})
+
+    do_PUT = do_POST
+    do_DELETE = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts into SYN retries
+    request_queue_size = 128
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.orders = 0
+        self.order_ids = count(1)
+        self._random = random.Random(seed)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def wait(self) -> bool:
+        """
+        Hold the request for ``latency``; True if it should fail.
+        """
+        self.requests += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    def start(self) -> "StubApiServer":
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -1,3 +1,300 @@
-from django.test import TestCase
+import asyncio
+import os
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+import orjson
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from the_combiner_view import metrics as process_metrics
+from the_combiner_view.async_api_utils import AsyncTradeExternalApis, close_async_clients
+from the_combiner_view.circuit_breaker import CircuitOpenError
+
+from . import frames, groups
+from .accounts import _user_accounts_key, aget_user_account_ids
+from . import automation_handler
+from .automation_handler import ACKED, REJECTED, AutomationHandler, PendingOrder, order_result
+from .broadcast import ClientOutbox, FrameBatcher
+from .messages import InvalidMessage, TokenSignal, parse_message
+from .models import AutomationRule
+from .rule_index import RuleIndex
+from .stub_api import StubApiServer
+
+
+def _rule(exchanges, market_type='spot', status='enabled', account='1'):
+    return AutomationRule.objects.create(
+        exchanges=exchanges, market_type=market_type, account=account, amount_usdt=10, status=status,
+    )
+
+
+def _token(token, exchange, market='spot'):
+    return {'token': token, 'exchange': exchange, 'market': market}
+
+
+class RuleIndexMatchTests(TestCase):
+    """
+    RuleIndex.match must pick the same rules and tokens as the per-rule loop
+    it replaced: normalized exchange names, Coinbase venues matching each
+    other, and the first token's market deciding the market of the message.
+    """
+    def setUp(self):
+        cache.clear()
+        self.index = RuleIndex()
+
+    def matched(self, tokens):
+        return [(rule.id, [token['token'] for token in matched]) for rule, matched in self.index.match(tokens)]
+
+    def test_exchange_names_are_normalized(self):
+        rule = _rule(['Binance', 'Gate.io'])
+        self.assertEqual(
+            self.matched([_token('AAA', 'BINANCE'), _token('BBB', 'gate io'), _token('CCC', 'Bybit')]),
+            [(rule.id, ['AAA', 'BBB'])],
+        )
+
+    def test_coinbase_venues_match_each_other(self):
+        international = _rule(['Coinbase International'])
+        plain = _rule(['Coinbase'])
+        _rule(['Binance'])
+        self.assertEqual(
+            self.matched([_token('AAA', 'Coinbase Exchange'), _token('BBB', 'coinbaseint')]),
+            [(international.id, ['AAA', 'BBB']), (plain.id, ['AAA', 'BBB'])],
+        )
+
+    def test_first_token_market_decides(self):
+        spot = _rule(['Binance'], market_type='spot')
+        future = _rule(['Binance'], market_type='future')
+        both = _rule(['Binance'], market_type='both')
+        self.assertEqual(
+            self.matched([_token('AAA', 'Binance', 'SPOT'), _token('BBB', 'Binance', 'future')]),
+            [(spot.id, ['AAA', 'BBB']), (both.id, ['AAA', 'BBB'])],
+        )
+        self.assertEqual(
+            self.matched([_token('CCC', 'Binance', 'future')]),
+            [(future.id, ['CCC']), (both.id, ['CCC'])],
+        )
+
+    def test_tokens_without_exchange_and_disabled_rules_are_skipped(self):
+        rule = _rule(['Binance'])
+        _rule(['Binance'], status='disabled')
+        self.assertEqual(
+            self.matched([_token('AAA', ''), {'token': 'BBB', 'market': 'spot'}, _token('CCC', 'Binance')]),
+            [(rule.id, ['CCC'])],
+        )
+
+    def test_sync_picks_up_changes_from_another_process(self):
+        writer, reader = RuleIndex(), RuleIndex()
+        reader.sync()
+        self.assertEqual(reader.match([_token('AAA', 'Binance')]), [])
+
+        # Saved through another process: the reader's signal receivers never ran
+        rule = _rule(['Binance'])
+        writer.publish_change()
+        self.assertEqual(reader.match([_token('AAA', 'Binance')]), [])
+        self.assertTrue(reader.sync())
+        self.assertEqual([matched.id for matched, _ in reader.match([_token('AAA', 'Binance')])], [rule.id])
+        self.assertFalse(reader.sync())
+
+
+class TokenSignalTests(SimpleTestCase):
+    def test_malformed_token_entries_are_skipped(self):
+        frame = (
+            '{"type": "tokens", "data": ['
+            '{"token": "AAA", "exchange": "Binance", "market": "spot"},'
+            '{"token": "BBB", "exchange": null, "market": "spot"},'
+            '{"token": "CCC", "exchange": "Bybit", "market": 1},'
+            '{"exchange": "Binance"}, "DDD", null,'
+            '{"token": "EEE", "exchange": "Kucoin"}'
+            ']}'
+        )
+        signal = parse_message(frame)
+        self.assertTrue(signal.is_tokens)
+        self.assertEqual([token['token'] for token in signal.data], ['AAA', 'EEE'])
+        self.assertEqual(signal.text, frame)
+
+    def test_missing_data_is_an_empty_signal(self):
+        self.assertEqual(TokenSignal.from_payload({'type': 'tokens', 'data': None}).data, ())
+
+    def test_rejects_frames_that_are_not_messages(self):
+        for frame in ('not json', '[1, 2]', '{"data": []}', '{"type": "tokens", "data": {"token": "AAA"}}'):
+            with self.subTest(frame=frame), self.assertRaises(InvalidMessage):
+                parse_message(frame)
+
+
+class FrameMergeTests(SimpleTestCase):
+    def test_objects_and_batches_merge_into_one_flat_array(self):
+        batch = frames.merge(['{"seq": 1}', ' {"seq": 2}'])
+        merged = frames.merge([batch, '{"seq": 3}'])
+        self.assertEqual(orjson.loads(merged), [{'seq': 1}, {'seq': 2}, {'seq': 3}])
+        self.assertEqual(frames.merge(['{"seq": 1}']), '{"seq": 1}')
+
+    def test_packed_frames_merge_like_json(self):
+        batch = frames.merge_packed([frames.pack('{"seq": 1}'), frames.pack('{"seq": 2}')])
+        merged = frames.merge_packed([batch, frames.pack('{"seq": 3}')])
+        self.assertEqual(msgpack.unpackb(merged), [{'seq': 1}, {'seq': 2}, {'seq': 3}])
+
+    def test_only_objects_are_mergeable(self):
+        self.assertTrue(frames.is_mergeable(' {"seq": 1}'))
+        for text in ('[{"seq": 1}]', 'ping', ''):
+            with self.subTest(text=text):
+                self.assertFalse(frames.is_mergeable(text))
+
+    def test_upstream_arrays_and_non_json_keep_their_boundaries(self):
+        upstream = ['{"seq": 1}', '[{"seq": 2}, {"seq": 3}]', '{"seq": 4}', '{"seq": 5}', 'ping', '{"seq": 6}']
+        expected = ['{"seq": 1}', '[{"seq": 2}, {"seq": 3}]', '[{"seq": 4},{"seq": 5}]', 'ping', '{"seq": 6}']
+        sent, written = [], []
+
+        async def send(text, raw):
+            sent.append((text, raw))
+
+        async def run():
+            done = asyncio.Event()
+
+            async def write(frame):
+                written.append(frame)
+                if len(written) == len(expected):
+                    done.set()
+
+            # The window never ends during the test, the last batch is flushed
+            batcher = FrameBatcher(send, window=3600)
+            for text in upstream:
+                await batcher.publish(text, frames.is_mergeable(text))
+            await batcher.flush()
+            outbox = ClientOutbox(write, window=0, max_frames=100)
+            for text, raw in sent:
+                outbox.put(text, raw=raw)
+            outbox.start()
+            try:
+                await asyncio.wait_for(done.wait(), timeout=5)
+            finally:
+                outbox.close()
+
+        asyncio.run(run())
+        self.assertEqual(written, expected)
+
+
+class OrderResultTests(SimpleTestCase):
+    def test_accepted_orders_are_acked(self):
+        for response in (
+            {'orderId': '1', 'status': 'FILLED', '_metadata': {'status_code': 200}},
+            {'orderId': '2', 'status': 'NEW'},
+            {'orderId': '3', 'code': 200},
+        ):
+            with self.subTest(response=response):
+                self.assertEqual(order_result(response), ACKED)
+
+    def test_error_bodies_and_dead_orders_are_rejected(self):
+        for response in (
+            {'code': 30004, 'msg': 'Insufficient position', '_metadata': {'status_code': 200}},
+            {'detail': 'Service unavailable', '_metadata': {'status_code': 503}},
+            {'orderId': '1', '_metadata': {'status_code': 400}},
+            {'error': 'Account locked'},
+            {'orderId': '2', 'status': 'REJECTED'},
+            {'orderId': '3', 'status': 'expired'},
+            ['not', 'an', 'order'],
+            None,
+        ):
+            with self.subTest(response=response):
+                self.assertEqual(order_result(response), REJECTED)
+
+
+class AsyncUserAccountsTests(SimpleTestCase):
+    """
+    TradingConsumer reads the user's accounts with the async client on its
+    own loop; the cache entries are the ones get_user_accounts uses.
+    """
+    def setUp(self):
+        cache.clear()
+        self.stub = StubApiServer().start()
+        self.addCleanup(self.stub.stop)
+        urls = mock.patch.dict(os.environ, {'TRADE_API_URL': self.stub.url, 'DEV_TRADE_API_URL': self.stub.url})
+        urls.start()
+        self.addCleanup(urls.stop)
+
+    def account_ids(self, username):
+        async def run():
+            try:
+                return await aget_user_account_ids(username)
+            finally:
+                await close_async_clients()
+        return asyncio.run(run())
+
+    def test_accounts_are_fetched_once_and_cached(self):
+        self.assertEqual(self.account_ids('alice'), ['1', '2'])
+        self.assertEqual(self.account_ids('alice'), ['1', '2'])
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_last_known_accounts_while_the_circuit_is_open(self):
+        self.account_ids('alice')
+        cache.delete(_user_accounts_key('alice'))
+        with mock.patch.object(AsyncTradeExternalApis, 'get_user_accounts', side_effect=CircuitOpenError('open')):
+            self.assertEqual(self.account_ids('alice'), ['1', '2'])
+            with self.assertRaises(CircuitOpenError):
+                self.account_ids('bob')
+
+
+class TradeNotificationFailureTests(SimpleTestCase):
+    """
+    A channel layer error while notifying one order must not cost the other
+    orders their notifications or the signal its outcomes.
+    """
+    def setUp(self):
+        self.orders = [
+            PendingOrder(rule_id=1, account_id=account, token=_token(symbol, 'MEXC'),
+                         order_data={'symbol': f'{symbol}USDT', 'side': 'BUY', 'type': 'MARKET',
+                                     'quote_order_qty': 5})
+            for account, symbol in ((1, 'AAA'), (2, 'BBB'), (3, 'CCC'))
+        ]
+        self.sent = []
+
+        async def group_send(group, event):
+            if group == groups.account_group(1):
+                raise RuntimeError('channel layer unavailable')
+            self.sent.append(group)
+
+        layer = mock.Mock(group_send=group_send)
+        trade_api = mock.Mock()
+        trade_api.create_mexc_order.side_effect = lambda account_id, data: {'orderId': data['symbol'],
+                                                                             'status': 'FILLED'}
+        for patcher in (
+            mock.patch.object(automation_handler, 'get_channel_layer', return_value=layer),
+            mock.patch.object(automation_handler, 'trade_api', trade_api),
+            mock.patch.object(AutomationHandler, '_prepare_orders', return_value=self.orders),
+            mock.patch.object(automation_handler.time, 'sleep'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assert_all_acked(self, outcomes):
+        self.assertEqual(sorted(order.account_id for order, _, _ in outcomes), [1, 2, 3])
+        self.assertEqual({result for _, result, _ in outcomes}, {ACKED})
+        self.assertEqual(len(self.sent), 2)
+
+    def test_sequential_dispatch(self):
+        self.assert_all_acked(AutomationHandler._handle_matching_tokens(mock.Mock(id=1), []))
+
+    def test_concurrent_dispatch(self):
+        self.assert_all_acked(AutomationHandler._dispatch_concurrently([(mock.Mock(id=1), [])]))
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_allowed_addresses_and_the_token_get_metrics(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5',
+                                             HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5',
+                                             HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_samples_of_other_workers_are_merged_into_their_families(self):
+        cache.set(process_metrics.SNAPSHOT_KEY.format(1), [
+            ('combiner_orders_total', 'counter', 'Orders sent by automation.',
+             [('', {'worker': '1', 'outcome': 'acked'}, 3)]),
+        ])
+        text = process_metrics.render_all(workers=2)
+        self.assertEqual(text.count('# TYPE combiner_orders_total counter'), 1)
+        self.assertIn('combiner_orders_total{worker="1",outcome="acked"} 3', text)
+        self.assertIn(f'combiner_broadcast_events_total{{worker="{process_metrics.WORKER}"}}', text)
@@ -12,4 +12,6 @@ urlpatterns = [
     path('rules/<int:rule_id>/', views.AutomationRuleView.as_view(), name='rule_detail'),
     path('api/exchanges/', get_exchanges, name='get_exchanges'),
     path('api/accounts/', get_accounts, name='get_accounts'),
+    path('api/broadcast/stats/', views.get_broadcast_stats, name='broadcast_stats'),
+    path('api/latency/', views.get_latency_stats, name='latency_stats'),
 ]
\ No newline at end of file
@@ -8,6 +8,11 @@ from the_combiner_view.api_utils import TradeExternalApis, ClassifierExternalApi
 import requests
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from . import broadcast, groups, latency
+from .accounts import account_cache, get_user_accounts, get_user_account_ids, invalidate_user_accounts
+from .external_service import ExternalWebSocketService
 from .models import AutomationRule
 from django.views.decorators.csrf import csrf_protect
 from django.utils.decorators import method_decorator
@@ -26,7 +31,7 @@ class TradingAccountsView(LoginRequiredMixin, View):
             logger.info(f"Fetching trading accounts for user: {request.user.username}")
             
             try:
-                user_data = self.trade_api.get_user_accounts(request.user.username)
+                user_data = get_user_accounts(request.user.username)
                 logger.info(f"Raw user data response: {user_data}")
                 
                 if user_data.get('status') == 'success':
@@ -72,10 +77,7 @@ class AutomationRuleView(LoginRequiredMixin, View):
 
     def get_user_accounts(self, username):
         try:
-            user_data = self.trade_api.get_user_accounts(username)
-            if user_data.get('status') == 'success':
-                return [str(account['id']) for account in user_data.get('accounts', [])]
-            return []
+            return get_user_account_ids(username)
         except Exception as e:
             logger.error(f"Error fetching user accounts: {e}")
             return []
@@ -224,6 +226,12 @@ def verify_account(request, account_id):
         logger.info(f"API Response: {response}")
         
         if response.get('status') in ['active', 'inactive', 'failed_verification']:
+            invalidate_user_accounts(request.user.username)
+            account_cache.prefetch([account_id])
+            # Open dashboards re-read the account list and join the new account's group
+            async_to_sync(get_channel_layer().group_send)(
+                groups.user_group(request.user.pk), {"type": "accounts_changed"}
+            )
             return JsonResponse({
                 'success': True,
                 'account': response,
@@ -289,11 +297,9 @@ def get_exchanges(request):
 
 def get_accounts(request):
     try:
-        trade_api = TradeExternalApis()
-        response = trade_api.get_user_accounts(request.user.username)
+        response = get_user_accounts(request.user.username)
         
-        # Log the response to see its structure
-        print("API Response:", response)
+        logger.debug("Accounts API response: %s", response)
         
         # Extract accounts from the response
         if isinstance(response, dict):
@@ -312,8 +318,25 @@ def get_accounts(request):
             'error': 'Invalid response format from API'
         })
     except Exception as e:
-        print("Error fetching accounts:", str(e))  # Add logging
+        logger.error(f"Error fetching accounts: {e}")
         return JsonResponse({
             'success': False,
             'error': str(e)
         }, status=500)
+
+
+@login_required
+def get_broadcast_stats(request):
+    """
+    Coalescing and drop counters of this worker's dashboard broadcast.
+    """
+    return JsonResponse({'success': True, 'stats': broadcast.stats()})
+
+
+@login_required
+def get_latency_stats(request):
+    """
+    Per-stage signal-to-order latency histograms of the ingest leader.
+    """
+    local = ExternalWebSocketService.get_instance().is_running
+    return JsonResponse({'success': True, 'stats': latency.shared_stats(local)})